@@ -0,0 +1,303 @@
+"""
+Recorded search pages of the portals and a local HTTP server replaying them, for benchmarks that must not hit the portals.
+
+Run from the project root:
+    python -m benchmarks.fixture_server record    # saves the live first result page of every portal
+    python -m benchmarks.fixture_server check     # fails when a parser no longer reads the saved pages
+    python -m benchmarks.fixture_server generate  # writes synthetic pages instead, where the portals can't be reached
+
+Only recorded pages catch a change of a portal's layout: record, then check.
+Synthetic pages follow the parsers' own selectors and are marked with SYNTHETIC_MARKER.
+"""
+import json
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+# name -> file, otodom_dom is an otodom page without the __NEXT_DATA__ json, parsed from the DOM
+FIXTURES = {
+    'otodom': 'otodom.html',
+    'otodom_dom': 'otodom_dom.html',
+    'olx': 'olx.html',
+    'nieruchomosci_online': 'nieruchomosci_online.html',
+}
+LISTINGS_PER_PAGE = 36
+SYNTHETIC_MARKER = b'<!-- synthetic fixture -->'
+# Bytes of a real first result page, the synthetic pages are padded with page chrome up to them
+PAGE_SIZES = {'otodom': 700_000, 'otodom_dom': 450_000, 'olx': 550_000, 'nieruchomosci_online': 300_000}
+NEXT_DATA = re.compile(rb'<script id="__NEXT_DATA__"[^>]*>.*?</script>', re.DOTALL)
+# Offer ids in the links of all three portals: otodom and olx '-ID<id>', nieruchomosci-online '/<id>.html'
+OFFER_ID = re.compile(rb'(?<=-ID)(\w+)|(?<=/)(\d+)(?=\.html)')
+STREETS = ['Puławska', 'Marszałkowska', 'Grochowska', 'Wołoska', 'Górczewska', 'Jana Pawła II', 'Targowa', 'Odkryta']
+DISTRICTS = ['Mokotów', 'Śródmieście', 'Praga-Południe', 'Wola', 'Bielany', 'Bemowo', 'Targówek', 'Białołęka']
+ROOMS = ['ONE', 'TWO', 'THREE', 'FOUR']
+FLOORS = ['GROUND', 'FIRST', 'SECOND', 'THIRD', 'FOURTH', 'ABOVE_TENTH']
+
+
+def _offers(seed, count=LISTINGS_PER_PAGE):
+    randomizer = random.Random(seed)
+    offers = []
+    for number in range(count):
+        rooms = randomizer.randrange(1, 5)
+        area = round(randomizer.uniform(20, 30) + rooms * 15, 1)
+        offers.append({
+            'id': 60000000 + seed * 1000 + number,
+            'title': f"{rooms}-pokojowe mieszkanie {randomizer.choice(['z balkonem', 'po remoncie', 'blisko metra', 'w nowym budynku'])}",
+            'price': int(round(randomizer.uniform(40, 90) * area, -1)),
+            'area': area,
+            'rooms': rooms,
+            'floor': randomizer.choice(FLOORS),
+            'street': randomizer.choice(STREETS),
+            'district': randomizer.choice(DISTRICTS),
+        })
+    return offers
+
+
+def _price(value):
+    return f"{value:,}".replace(',', '\xa0') + '\xa0zł'
+
+
+def _chrome(seed, size):
+    """Navigation, filters, icons and script blobs around the results, as many nodes per byte as a real page."""
+    randomizer = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size:
+        if randomizer.random() < 0.2:
+            config = {f'k{randomizer.getrandbits(32):x}': [randomizer.getrandbits(24) for _ in range(8)] for _ in range(20)}
+            part = f'<script>window.__APP_CONFIG__ = Object.assign(window.__APP_CONFIG__ || {{}}, {json.dumps(config)});</script>'
+        else:
+            items = ''.join(
+                f'<li class="css-{randomizer.getrandbits(24):x}"><a href="/pl/wyniki/{randomizer.choice(DISTRICTS)}" data-cy="nav-link">'
+                f'<svg viewBox="0 0 24 24" class="css-{randomizer.getrandbits(24):x}"><path d="M{randomizer.randrange(24)} 4h16v2H4z"/></svg>'
+                f'<span>{randomizer.choice(STREETS)}</span></a></li>'
+                for _ in range(10)
+            )
+            part = f'<nav class="css-{randomizer.getrandbits(24):x}"><ul>{items}</ul></nav>'
+        parts.append(part)
+        total += len(part.encode())
+    return ''.join(parts)
+
+
+def _page(name, body, head=''):
+    chrome = _chrome(len(name), max(0, PAGE_SIZES[name] - len(body.encode()) - len(head.encode())) // 2)
+    return (
+        f'<!DOCTYPE html>{SYNTHETIC_MARKER.decode()}<html lang="pl"><head><meta charset="utf-8"><title>Wyniki</title>{head}</head>'
+        f'<body>{chrome}{body}{chrome}</body></html>'
+    )
+
+
+def _otodom_sections(offers):
+    # The parser skips the first three sections, the real page has other content there
+    sections = ['<section class="eeungyz1 css-hqx1d9 e12fn6ie0"><p>promo</p></section>'] * 3
+    for offer in offers:
+        rooms = ['1 pokój', '2 pokoje', '3 pokoje', '4 pokoje'][offer['rooms'] - 1]
+        sections.append(
+            '<section class="eeungyz1 css-hqx1d9 e12fn6ie0"><div>'
+            f'<a class="css-16vl3c1 e17g0c820" href="/pl/oferta/mieszkanie-ID{offer["id"]}">{offer["title"]}</a>'
+            f'<span class="css-2bt9f1 evk7nst0">{_price(offer["price"])}</span>'
+            f'<p class="css-42r2ms eejmx80">ul. {offer["street"]}, {offer["district"]}, Warszawa, mazowieckie</p>'
+            '<div class="css-1c1kq07 e1clni9t0"><dl>'
+            f'<dt>Liczba pokoi</dt><dd>{rooms}</dd><dt>Powierzchnia</dt><dd>{offer["area"]} m²</dd>'
+            f'<dt>Piętro</dt><dd>{offer["floor"].lower()}</dd>'
+            '</dl></div></div></section>'
+        )
+    return ''.join(sections)
+
+
+def _otodom_next_data(offers):
+    items = [{
+        'id': offer['id'],
+        'title': offer['title'],
+        'slug': f"mieszkanie-ID{offer['id']}",
+        'isPromoted': False,
+        'totalPrice': {'value': offer['price'], 'currency': 'PLN'},
+        'areaInSquareMeters': offer['area'],
+        'roomsNumber': ROOMS[offer['rooms'] - 1],
+        'floorNumber': offer['floor'],
+        'dateCreated': '2024-10-01 12:00:00',
+        # Fields the parser skips, they make most of the real json
+        'images': [{'medium': f"https://ireland.apollo.olxcdn.com/v1/files/{offer['id']}{number}/image;s=655x491"} for number in range(8)],
+        'shortDescription': f"{offer['title']}. " * 8,
+        'agency': {'id': offer['id'] % 97, 'name': 'Biuro Nieruchomości', 'slug': 'biuro-nieruchomosci', 'imageUrl': None},
+        'openDays': '', 'isExclusiveOffer': False, 'isPrivateOwner': offer['id'] % 3 == 0,
+        'location': {'address': {'street': {'name': f"ul. {offer['street']}"}, 'city': {'name': 'Warszawa'}, 'province': {'name': 'mazowieckie'}},
+                     'reverseGeocoding': {'locations': [{'fullName': f"{offer['district']}, Warszawa, mazowieckie"}]}},
+    } for offer in offers]
+    data = {'props': {'pageProps': {'data': {'searchAds': {'items': items}}}}}
+    return f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(data, ensure_ascii=False)}</script>'
+
+
+def _olx(offers):
+    cards = []
+    for offer in offers:
+        cards.append(
+            '<div class="css-1g5933j" data-cy="l-card"><div class="css-1apmciz">'
+            f'<a class="css-z3gu2d" href="/d/oferta/mieszkanie-CID3-ID{offer["id"]}.html">'
+            f'<h6 class="css-1wxaaza">{offer["title"]}</h6></a>'
+            f'<p class="css-13afqrm" data-testid="ad-price">{_price(offer["price"])}</p>'
+            f'<p class="css-1mwdrlh" data-testid="location-date">Warszawa, {offer["district"]} - Odświeżono dnia 12 października 2024</p>'
+            f'<span class="css-643j0o">{offer["area"]} m² - {round(offer["price"] / offer["area"], 2)} zł/m²</span>'
+            '</div></div>'
+        )
+    return ''.join(cards)
+
+
+def _nieruchomosci(offers):
+    tiles = []
+    for offer in offers:
+        tiles.append(
+            '<div class="tile tile-tile"><div class="tile-inner">'
+            f'<h2 class="name"><a href="https://warszawa.nieruchomosci-online.pl/mieszkanie,z-balkonem/{offer["id"]}.html">{offer["title"]}</a></h2>'
+            f'<p class="province">{offer["district"]},\nWarszawa</p>'
+            f'<p class="title-a primary-display"><span>{_price(offer["price"])}</span> <span class="area">{offer["area"]} m²</span></p>'
+            '</div></div>'
+        )
+    return ''.join(tiles)
+
+
+def generate():
+    """Writes synthetic pages with LISTINGS_PER_PAGE offers in the markup each parser reads."""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    pages = {
+        'otodom': _page('otodom', _otodom_sections(_offers(1)), _otodom_next_data(_offers(1))),
+        'otodom_dom': _page('otodom_dom', _otodom_sections(_offers(1))),
+        'olx': _page('olx', _olx(_offers(2))),
+        'nieruchomosci_online': _page('nieruchomosci_online', _nieruchomosci(_offers(3))),
+    }
+    for name, page in pages.items():
+        with open(os.path.join(FIXTURES_DIR, FIXTURES[name]), 'w', encoding='utf-8') as file:
+            file.write(page)
+
+
+def record():
+    """Saves the live first result page of every portal for the default filters, and checks them."""
+    from src.utils.constants import DEFAULT_USER_DATA
+    from src.scrappers.http_client import get_client
+    from src.scrappers.scrape_planner import SITES, search_filters
+
+    filters = dict(DEFAULT_USER_DATA, min_price=DEFAULT_USER_DATA['minimum_price'], max_price=DEFAULT_USER_DATA['maximum_price'])
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for name, (build_url, parse_function) in SITES.items():
+        response = get_client().get(build_url(search_filters(filters, name)))
+        response.raise_for_status()
+        with open(os.path.join(FIXTURES_DIR, FIXTURES[name]), 'wb') as file:
+            file.write(response.content)
+        if name == 'otodom':
+            # The same page without its json, for the DOM parser
+            with open(os.path.join(FIXTURES_DIR, FIXTURES['otodom_dom']), 'wb') as file:
+                file.write(NEXT_DATA.sub(b'', response.content))
+    return check()
+
+
+def check():
+    """
+    Parses every saved page with both parser backends, prints what they read and returns False
+    when a parser reads no listings or no prices and areas from a page: its layout has changed.
+    """
+    from src.scrappers.otodom_scrapper import parse_otodom
+    from src.scrappers.olx_scrapper import parse_olx
+    from src.scrappers.nieruchomosci_online_scrapper import parse_nieruchomosci
+
+    parsers = {'otodom': parse_otodom, 'otodom_dom': parse_otodom, 'olx': parse_olx, 'nieruchomosci_online': parse_nieruchomosci}
+    ok = True
+    for name, parse in parsers.items():
+        page = load(name)
+        for backend in ('lxml', 'bs4'):
+            listings = parse(page, backend)
+            prices = sum(listing.price is not None for listing in listings)
+            areas = sum(listing.area is not None for listing in listings)
+            readable = listings and prices and areas
+            ok = ok and bool(readable)
+            print(f"{'ok' if readable else 'FAILED':6} {name} {backend}: {len(listings)} listings, {prices} prices, {areas} areas"
+                  f"{' (synthetic page)' if is_synthetic(name) else ''}")
+    return ok
+
+
+def load(name):
+    with open(os.path.join(FIXTURES_DIR, FIXTURES[name]), 'rb') as file:
+        return file.read()
+
+
+def is_synthetic(name):
+    return SYNTHETIC_MARKER in load(name)[:200]
+
+
+def freshen(page, epoch, count):
+    """Gives the first count offers of the page new ids, as if they were published in the given epoch."""
+    if not epoch:
+        return page
+    return OFFER_ID.sub(lambda match: b'%d0%s' % (epoch, match.group()), page, count=count)
+
+
+class FixtureServer:
+    """
+    Serves every fixture at /<name> on a free local port, whatever the query string.
+    latency adds a delay to every response, like the round trip to a portal.
+    With churn set, the newest new_offers offers of every page get new ids every churn seconds.
+    """
+
+    def __init__(self, latency=0, churn=None, new_offers=5):
+        pages = {f'/{name}': load(name) for name in FIXTURES}
+        started = time.monotonic()
+        self.requests = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out as separate writes, don't let Nagle hold the body back
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                server.requests += 1
+                page = pages.get(urlsplit(self.path).path)
+                if page is not None and churn:
+                    page = freshen(page, int((time.monotonic() - started) // churn), new_offers)
+                if latency:
+                    time.sleep(latency)
+                if page is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+
+    def url(self, name):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/{name}'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, name='fixture-server', daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == '__main__':
+    commands = {'generate': generate, 'record': record, 'check': check}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        print('Usage: python -m benchmarks.fixture_server record|check|generate')
+        sys.exit(1)
+    if commands[sys.argv[1]]() is False:
+        sys.exit(1)
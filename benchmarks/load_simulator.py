@@ -0,0 +1,228 @@
+"""
+Runs the real monitoring pipeline for N synthetic users against a fake Telegram bot and the local fixture server,
+to find how many monitoring users one process keeps up with. Every size runs in its own process.
+
+Run from the project root:
+    python -m benchmarks.load_simulator [--users 1000 10000 100000] [--duration 240] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from benchmarks.fixture_server import FixtureServer
+
+# Portal host -> fixture replayed for it
+HOSTS = {
+    'www.otodom.pl': 'otodom',
+    'www.olx.pl': 'olx',
+    'www.nieruchomosci-online.pl': 'nieruchomosci_online',
+}
+PORTAL_LATENCY = 0.2  # seconds, a portal's response time
+TELEGRAM_LATENCY = 0.05  # seconds per sent message
+
+
+def rss_kb():
+    with open('/proc/self/statm') as file:
+        return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def synthetic_user(randomizer, places, weights):
+    """Filters like real users pick them: mostly rent in the big cities, a few districts, radius and digest users."""
+    region, city = randomizer.choices(places, weights)[0]
+    offer_type = 'rent' if randomizer.random() < 0.8 else 'sale'
+    if offer_type == 'rent':
+        minimum_price = randomizer.choice([0, 1000, 2000, 3000])
+        maximum_price = minimum_price + randomizer.choice([1500, 2500, 4000])
+    else:
+        minimum_price = randomizer.choice([0, 300000, 500000])
+        maximum_price = minimum_price + randomizer.choice([300000, 600000])
+    location = {'text': city['text'], 'url': city['url'], 'text_simple': city['text_simple']}
+    if city['districts'] and randomizer.random() < 0.15:
+        location['district'] = randomizer.choice(city['districts'])['text_district']
+    rooms = sorted(randomizer.sample([1, 2, 3, 4], randomizer.choice([1, 2, 2, 3, 4])))
+    return {
+        'offer_type': offer_type,
+        'minimum_price': minimum_price,
+        'maximum_price': maximum_price,
+        'area_min': randomizer.choice(['0', '25', '40']),
+        'area_max': randomizer.choice(['50', '70', '1000']),
+        'selected_rooms': rooms,
+        'region': region,
+        'city': location,
+        'radius_km': 10 if 'district' not in location and randomizer.random() < 0.05 else 0,
+        'digest_interval': 3600 if randomizer.random() < 0.1 else 0,
+    }
+
+
+class FakeBot:
+    """Stands in for QueuedBot: messages go through a real outbox whose delivery only counts them."""
+
+    def __init__(self):
+        from src.utils.outbox import Outbox
+        self.sent = 0
+        self.outbox = Outbox(self._deliver)
+
+    def _deliver(self, chat_id, text, **kwargs):
+        time.sleep(TELEGRAM_LATENCY)
+        self.sent += 1
+
+    def send_message(self, chat_id, text, priority=0, **kwargs):
+        self.outbox.put(chat_id, text, priority, **kwargs)
+
+
+def simulate(users, duration, interval, seed=1):
+    """Simulates one size in this process and returns its report."""
+    import httpx
+    import db_placeholder as db
+    from src.commands.digest import DIGEST_TICK, send_digests
+    from src.commands.monitoring import check_new_offers
+    from src.scrappers import http_client, scheduler
+    from src.storage.sqlite_backend import SqliteBackend
+    from src.utils.gazetteer import get_gazetteer
+
+    class FixtureTransport(httpx.AsyncBaseTransport):
+        """Sends the requests for every portal to the fixture server."""
+
+        def __init__(self, server):
+            self.server = server
+            self.transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=http_client.POOL_SIZE))
+
+        async def handle_async_request(self, request):
+            request.url = httpx.URL(self.server.url(HOSTS[request.url.host]))
+            return await self.transport.handle_async_request(request)
+
+    randomizer = random.Random(seed)
+    places = []
+    weights = []
+    for place in get_gazetteer()['places'].values():
+        if place['district'] is None:
+            places.append((place['region'], place['city']))
+            # Cities with districts are the big ones, they get most of the users
+            weights.append((1 + len(place['city']['districts'])) ** 2)
+
+    database = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    database.close()
+    db.init(SqliteBackend(database.name))
+    rss_before = rss_kb()
+    started = time.perf_counter()
+    for user_id in range(1, users + 1):
+        settings = db.user_data[user_id]
+        for key, value in synthetic_user(randomizer, places, weights).items():
+            settings[key] = value
+        settings['check_interval'] = interval
+        settings['first_name'] = f'user{user_id}'
+        settings['monitoring'] = True
+    scheduler.load(range(1, users + 1))
+    setup_seconds = time.perf_counter() - started
+    rss_users = rss_kb()
+
+    bot = FakeBot()
+    context = SimpleNamespace(bot=bot)
+    ticks = []
+    lags = []
+    missed = 0
+    with FixtureServer(latency=PORTAL_LATENCY, churn=interval, new_offers=5) as server:
+        http_client._async_client = httpx.AsyncClient(transport=FixtureTransport(server), headers=http_client.HEADERS, timeout=http_client.REQUEST_TIMEOUT)
+        bot.outbox.start()
+        start = time.monotonic()
+        next_tick = start
+        next_digest = start + DIGEST_TICK
+        # Drive the checks like monitoring.start_checking: every scheduler.TICK seconds on one thread,
+        # a run longer than a tick delays the next one, counted as missed ticks
+        while time.monotonic() - start < duration:
+            lags.append(scheduler.lag())
+            tick_started = time.monotonic()
+            check_new_offers(context)
+            if tick_started >= next_digest:
+                send_digests(context)
+                next_digest += DIGEST_TICK
+            took = time.monotonic() - tick_started
+            ticks.append(took)
+            missed += int(took // scheduler.TICK)
+            next_tick += scheduler.TICK * (1 + int(took // scheduler.TICK))
+            time.sleep(max(0, next_tick - time.monotonic()))
+        scrapes = server.requests
+        queued = len(bot.outbox)
+        bot.outbox.close(timeout=0)
+        http_client.close()
+    db.close()
+    os.unlink(database.name)
+
+    ticks.sort()
+    lags.sort()
+    return {
+        'users': users,
+        'duration_seconds': duration,
+        'check_interval_seconds': interval,
+        'searches': scheduler.size()[0],
+        'scrapes_per_second_budget': round(scheduler.scrape_rate(), 2),
+        'setup_seconds': round(setup_seconds, 2),
+        'ticks': len(ticks),
+        'tick_seconds': {
+            'mean': statistics.mean(ticks),
+            'p95': ticks[int(len(ticks) * 0.95)],
+            'max': ticks[-1],
+        },
+        'cycle_lag_seconds': {
+            'mean': statistics.mean(lags),
+            'p95': lags[int(len(lags) * 0.95)],
+            'max': lags[-1],
+        },
+        'searches_waiting_at_end': scheduler.backlog(),
+        'jobs_missed': missed,
+        'scrapes': scrapes,
+        'scrapes_per_second': round(scrapes / duration, 2),
+        'messages_sent': bot.sent,
+        'messages_queued_at_end': queued,
+        'rss_kb': {
+            'before_users': rss_before,
+            'after_users': rss_users,
+            'peak': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--duration', type=float, default=240, help='seconds simulated for every size, in real time')
+    parser.add_argument('--interval', type=int, default=240, help='check interval of every user in seconds')
+    parser.add_argument('--output', help='also write the results to this file')
+    # Internal, set for the child process simulating one size
+    parser.add_argument('--run', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(simulate(args.run, args.duration, args.interval)))
+        return
+
+    results = []
+    for users in args.users:
+        child = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.load_simulator', '--run', str(users), '--duration', str(args.duration), '--interval', str(args.interval)],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(child.stdout.splitlines()[-1]))
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+
+
+if __name__ == '__main__':
+    main()
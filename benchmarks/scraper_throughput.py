@@ -0,0 +1,163 @@
+"""
+Measures fetch + parse of the recorded search pages for every scraper and parser backend, served by a local HTTP server.
+Pages are fetched like the bot fetches them: through fetch_engine.fetch_all on the shared async client and the page cache.
+Every scraper and backend runs in its own process so the peak RSS is its own.
+
+Run from the project root:
+    python -m benchmarks.scraper_throughput [--iterations 50] [--output results.json]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from benchmarks.fixture_server import FixtureServer, is_synthetic, load
+
+# name -> (scraper module, parse function, fixture served)
+SCRAPERS = {
+    'otodom': ('src.scrappers.otodom_scrapper', 'parse_otodom', 'otodom'),
+    'otodom_dom': ('src.scrappers.otodom_scrapper', 'parse_otodom', 'otodom_dom'),
+    'olx': ('src.scrappers.olx_scrapper', 'parse_olx', 'olx'),
+    'nieruchomosci_online': ('src.scrappers.nieruchomosci_online_scrapper', 'parse_nieruchomosci', 'nieruchomosci_online'),
+}
+ALLOCATION_ITERATIONS = 5  # traced separately, tracemalloc slows everything down
+BATCH = 16  # searches of one site fetched together, like a scheduler tick with many due searches
+
+
+def run(scraper, backend, iterations):
+    """Measures one scraper with one backend in this process."""
+    import importlib
+    from src.scrappers import http_client
+    from src.scrappers.fetch_engine import fetch_all
+    from src.scrappers.parser_backend import get_backend
+
+    os.environ['PARSER_BACKEND'] = backend
+    module_name, parse_name, fixture = SCRAPERS[scraper]
+    parse = getattr(importlib.import_module(module_name), parse_name)
+
+    with FixtureServer() as server:
+        url = server.url(fixture)
+
+        def scrape():
+            # A changed page, like the first check of a search or the follow-up pages
+            return parse(fetch_all([url], conditional=False)[url])
+
+        listings = len(scrape())  # warms up the connection and the imports
+        times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            scrape()
+            times.append(time.perf_counter() - start)
+
+        # An unchanged page: the conditional fetch hashes the body, NOT_MODIFIED skips the parse
+        fetch_all([url])
+        unchanged_times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fetch_all([url])
+            unchanged_times.append(time.perf_counter() - start)
+
+        # Many searches of the site at once, within the engine's per-host limit
+        urls = [f'{url}?search={number}' for number in range(BATCH)]
+        batch_times = []
+        for _ in range(max(1, iterations // BATCH)):
+            start = time.perf_counter()
+            pages = fetch_all(urls, conditional=False)
+            for page in pages.values():
+                parse(page)
+            batch_times.append(time.perf_counter() - start)
+
+        # The same page without the fetch, to tell the parser from the network stack
+        content = load(fixture)
+        parse_times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            parse(content)
+            parse_times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        peaks = []
+        blocks = []
+        for _ in range(ALLOCATION_ITERATIONS):
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            result = scrape()
+            gc.collect()  # the bs4 tree holds reference cycles
+            after = tracemalloc.take_snapshot()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            # Blocks still held by the returned listings, the rest was freed with the page
+            blocks.append(sum(stat.count_diff for stat in after.compare_to(before, 'filename')))
+            del result
+        tracemalloc.stop()
+    http_client.close()
+
+    times.sort()
+    return {
+        'scraper': scraper,
+        'backend': get_backend(backend),
+        'synthetic_page': is_synthetic(fixture),
+        'page_bytes': len(content),
+        'iterations': iterations,
+        'listings_per_page': listings,
+        'seconds_per_page': {
+            'mean': statistics.mean(times),
+            'median': statistics.median(times),
+            'p95': times[min(len(times) - 1, int(len(times) * 0.95))],
+        },
+        'parse_seconds_per_page': {
+            'mean': statistics.mean(parse_times),
+            'median': statistics.median(parse_times),
+        },
+        'unchanged_seconds_per_page': statistics.median(unchanged_times),
+        'listings_per_second': round(listings / statistics.mean(times), 1),
+        'batch_listings_per_second': round(listings * BATCH / statistics.mean(batch_times), 1),
+        # ru_maxrss is in kB on Linux
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'traced_peak_bytes_per_page': max(peaks),
+        'retained_blocks_per_page': max(blocks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--scrapers', nargs='+', choices=list(SCRAPERS), default=list(SCRAPERS))
+    parser.add_argument('--backends', nargs='+', choices=['lxml', 'bs4'], default=['lxml', 'bs4'])
+    parser.add_argument('--output', help='also write the results to this file')
+    # Internal, set for the child process measuring one combination
+    parser.add_argument('--run', nargs=2, metavar=('SCRAPER', 'BACKEND'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(*args.run, args.iterations)))
+        return
+
+    results = []
+    for scraper in args.scrapers:
+        for backend in args.backends:
+            child = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.scraper_throughput', '--run', scraper, backend, '--iterations', str(args.iterations)],
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(child.stdout.splitlines()[-1]))
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+
+
+if __name__ == '__main__':
+    main()
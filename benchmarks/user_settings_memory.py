@@ -0,0 +1,51 @@
+"""
+Measures the per-user memory of the settings record and checks that users don't share mutable defaults.
+
+Run from the project root:
+    python -m benchmarks.user_settings_memory [number_of_users]
+"""
+import json
+import sys
+import tracemalloc
+from collections import defaultdict
+from src.utils.constants import DEFAULT_USER_DATA
+from src.utils.user_settings import UserSettings
+
+
+def measure(factory, users):
+    tracemalloc.start()
+    user_data = defaultdict(factory)
+    for user_id in range(users):
+        # Typical session: the user touches the rooms and changes the price range
+        user_data[user_id]['selected_rooms']
+        user_data[user_id]['minimum_price'] = 1000 + user_id % 50 * 100
+        user_data[user_id]['maximum_price'] = 4000
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return user_data, size
+
+
+def contaminated(user_data):
+    # Changing the rooms of one user in place must not show up for another
+    user_data[0]['selected_rooms'].append(5)
+    shared = 5 in user_data[1]['selected_rooms']
+    user_data[0]['selected_rooms'].remove(5)
+    return shared
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    results = {'users': users}
+    for name, factory in [('dict_copy', lambda: DEFAULT_USER_DATA.copy()), ('user_settings', UserSettings)]:
+        user_data, size = measure(factory, users)
+        results[name] = {
+            'total_bytes': size,
+            'bytes_per_user': round(size / users, 1),
+            'cross_user_contamination': contaminated(user_data),
+        }
+        del user_data
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,48 @@
-from src.utils.constants import DEFAULT_USER_DATA
-from collections import defaultdict
+from src.storage.sqlite_backend import SqliteBackend
+from src.storage.user_store import UserStore, SeenOffersStore
+import logging
+import os
+import threading
 
+FLUSH_INTERVAL = 5  # seconds between batched writes to the storage backend
+DATABASE_FILE = os.getenv('DATABASE_FILE', 'instant_rentals.db')
 
-def init():
-    global user_data 
-    user_data = defaultdict(lambda: DEFAULT_USER_DATA.copy())
-    user_data["verbose"] = 1
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+
+def init(backend=None):
+    global user_data, seen_offers, storage
+    storage = backend or SqliteBackend(DATABASE_FILE)
+    user_data = UserStore(storage)
+    # (user_id, site) -> SeenOffers
+    seen_offers = SeenOffersStore(storage)
+    _start_flushing()
+
+
+def flush():
+    """Writes every settings change and seen offers update since the last flush in one batch."""
+    users = user_data.take_changes()
+    offers = seen_offers.take_changes()
+    if users or offers:
+        storage.save(users, offers)
+
+
+def _start_flushing():
+    global _stop_flushing
+    _stop_flushing = threading.Event()
+
+    def flush_periodically():
+        while not _stop_flushing.wait(FLUSH_INTERVAL):
+            try:
+                flush()
+            except Exception:
+                logger.exception('saving the user data failed')
+
+    threading.Thread(target=flush_periodically, name='db-flush', daemon=True).start()
+
+
+def close():
+    """Stops the background writes, saves what's left and closes the backend."""
+    _stop_flushing.set()
+    flush()
+    storage.close()
@@ -1,3 +1,7 @@
+from dotenv import load_dotenv
+# Before the other imports, the modules read their settings from the environment when imported
+load_dotenv(override=True)
+
 import logging
 import os
 import requests
@@ -8,27 +12,32 @@ from src.commands.set_price import price_conv_handler, set_price_start
 from src.commands.room_selection import room_selection, start_room_selection, confirm_room_selection
 from src.commands.get_filters import get_filters
 from src.commands.get_offer_sources import get_offer_sources
-from src.commands.monitoring import start_periodic_check, stop_periodic_check
+from src.commands.monitoring import start_periodic_check, stop_periodic_check, start_checking, stop_checking
 from src.commands.set_location import location_conv_handler, set_location_start
+from src.commands.inline_location import inline_city_search, set_city_command
+from src.commands.set_radius import set_radius
+from src.commands.set_interval import set_interval
+from src.commands.digest import DIGEST_TICK, digest_page, send_digests, set_digest
+from src.commands.user_profile import remember_user
 
-from dotenv import load_dotenv
 from collections import defaultdict
 from telegram import Update, ForceReply, InlineKeyboardMarkup, InlineKeyboardButton, ParseMode, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import Updater, CommandHandler, MessageHandler, Filters, CallbackContext, CallbackQueryHandler, ConversationHandler, JobQueue
+from telegram.ext import Updater, CommandHandler, MessageHandler, Filters, CallbackContext, CallbackQueryHandler, ConversationHandler, JobQueue, InlineQueryHandler, TypeHandler
 from datetime import datetime, timedelta
 from src.utils.constants import *
 from src.utils.markups import cancel_markup, get_markup, start_menu_markup, stop_monitoring_markup
 import db_placeholder as db
-
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+from src.scrappers import http_client, scheduler
+from src.scrappers.scrape_planner import active_monitors
+from src.utils.gazetteer import get_gazetteer
+from src.utils.outbox import QueuedBot
+from src.utils import logs, metrics
+from telegram.utils.request import Request
 
 logger = logging.getLogger(__name__)
 
 def echo(update: Update, context: CallbackContext) -> None:
-    print(f'{update.message.from_user.first_name} wrote {update.message.text}')
+    logger.debug('unrecognized message user=%s text=%r', update.message.from_user.first_name, update.message.text)
     update.message.reply_text("I'm sorry, I'm not sure what you mean. Please use the /menu command to see the available options.")
 
 
@@ -39,18 +48,28 @@ def start(update: Update, context: CallbackContext) -> None:
 def offer_type_switch(update: Update, context: CallbackContext):
     user_id = update.message.from_user.id
     db.user_data[user_id]['offer_type'] = 'rent' if db.user_data[user_id]['offer_type'] == 'sale' else 'sale'
+    if db.user_data[user_id]['monitoring']:
+        scheduler.subscribe(user_id)
     context.bot.send_message(user_id, f"Offer type switched to {db.user_data[user_id]['offer_type']}.", reply_markup=get_markup(db.user_data,user_id))
 
 
 
 def main() -> None:
-    load_dotenv(override=True)
+    # Records go through a queue to a listener thread, levels come from LOG_LEVEL and LOG_LEVEL_<logger>
+    logs.setup()
     token = os.getenv('TELEGRAM_BOT_TOKEN')
-    updater = Updater(token)
+    # Load the city indexes now instead of on the first location message
+    get_gazetteer()
+    # Every message goes through the bot's outbox, delivered within Telegram's flood limits
+    bot = QueuedBot(token, request=Request(con_pool_size=8))
+    bot.outbox.start()
+    updater = Updater(bot=bot)
 
     # Get the dispatcher to register handlers
     # Then, we register each handler and the conditions the update must meet to trigger it
     dispatcher = updater.dispatcher
+    # Group -1 runs before the handlers below for every update, without stopping them
+    dispatcher.add_handler(TypeHandler(Update, remember_user), group=-1)
     dispatcher.add_handler(CallbackQueryHandler(room_selection, pattern='^room_\\d$'))
     dispatcher.add_handler(CallbackQueryHandler(confirm_room_selection, pattern='^confirm_rooms$'))
     dispatcher.add_handler(price_conv_handler)
@@ -58,6 +77,12 @@ def main() -> None:
     dispatcher.add_handler(location_conv_handler)
     dispatcher.add_handler(CommandHandler("start", start))
     dispatcher.add_handler(CommandHandler("menu", start))
+    dispatcher.add_handler(CommandHandler("setcity", set_city_command))
+    dispatcher.add_handler(CommandHandler("radius", set_radius))
+    dispatcher.add_handler(CommandHandler("interval", set_interval))
+    dispatcher.add_handler(CommandHandler("digest", set_digest))
+    dispatcher.add_handler(CallbackQueryHandler(digest_page, pattern='^digest_\\d+$'))
+    dispatcher.add_handler(InlineQueryHandler(inline_city_search))
 
     
     dispatcher.add_handler(MessageHandler(Filters.regex(f'^{BTN_PRICE_RANGE}$'), set_price_start))
@@ -71,12 +96,26 @@ def main() -> None:
     dispatcher.add_handler(MessageHandler(Filters.regex(f'^{BTN_SET_LOCATION}$'), set_location_start))
 
     dispatcher.add_handler(MessageHandler(~Filters.command, echo))
+
+    # One thread runs the due searches of all monitoring users, sharing identical searches
+    scheduler.load(active_monitors())
+    metrics.ACTIVE_MONITORS.set_function(lambda: scheduler.size()[1])
+    metrics.SEARCH_BACKLOG.set_function(scheduler.backlog)
+    metrics.OUTBOX_BACKLOG.set_function(lambda: len(bot.outbox))
+    metrics.start()
+    start_checking(dispatcher)
+    updater.job_queue.run_repeating(send_digests, interval=DIGEST_TICK, first=DIGEST_TICK, name='send_digests')
     
     # Start the Bot
     updater.start_polling()
 
     # Run the bot until you press Ctrl-C
     updater.idle()
+    stop_checking()
+    bot.outbox.close()
+    http_client.close()
+    db.close()
+    logs.stop()
 
 
 if __name__ == '__main__':
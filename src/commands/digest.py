@@ -0,0 +1,143 @@
+import threading
+import time
+import db_placeholder as db
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import CallbackContext
+from src.utils.markups import get_markup
+from src.utils.outbox import NOTIFICATION
+from src.commands.user_profile import user_name
+from src.utils.logs import get_sampled_logger
+
+DIGEST_INTERVALS = {'off': 0, '30': 30 * 60, '60': 60 * 60}
+ORDERS = {'price': 'price_per_m2', 'recent': 'recent'}
+PAGE_SIZE = 5
+MAX_BUFFERED = 200  # offers kept per user until the digest is sent, the oldest are dropped first
+DIGEST_TICK = 60  # seconds between two runs of the digest job
+
+logger = get_sampled_logger(__name__)
+
+_lock = threading.Lock()
+# user_id -> {'since': time the first offer came in, 'offers': [(offer, duplicates, found at)]}
+_buffers = {}
+# user_id -> pages of the last digest sent, for the page buttons
+_pages = {}
+
+
+def add_offers(user_id, clusters):
+    """
+    Buffers the new offers of the user, clusters being [(offer, copies of it on other sites)].
+    A flat already waiting in the buffer, found again from another site, is not added twice.
+    """
+    now = time.time()
+    with _lock:
+        buffer = _buffers.setdefault(user_id, {'since': now, 'offers': []})
+        buffered = {offer.cluster_id for offer, duplicates, found_at in buffer['offers']}
+        buffer['offers'].extend((offer, duplicates, now) for offer, duplicates in clusters if offer.cluster_id not in buffered)
+        del buffer['offers'][:-MAX_BUFFERED]
+
+
+def price_per_m2(offer):
+    if offer.price is None or not offer.area:
+        return None
+    return offer.price / offer.area
+
+
+def rank(offers, order):
+    """Cheapest per m² first, offers without price or area last, or newest first."""
+    if order == 'recent':
+        return sorted(offers, key=lambda item: item[2], reverse=True)
+    return sorted(offers, key=lambda item: (price_per_m2(item[0]) is None, price_per_m2(item[0]) or 0))
+
+
+def format_offer(position, offer, duplicates):
+    details = [offer.price_text, offer.area_text]
+    if offer.rooms is not None:
+        details.append(f"{offer.rooms} rooms")
+    if price_per_m2(offer) is not None:
+        details.append(f"{price_per_m2(offer):,.0f} zł/m²".replace(',', ' '))
+    text = (
+        f"{position}. {offer.title}\n"
+        f"{', '.join(detail for detail in details if detail)}\n"
+        f"{offer.source}: {offer.link}\n"
+    )
+    for duplicate in duplicates:
+        text += f"{duplicate.source}: {duplicate.link}\n"
+    return text
+
+
+def build_pages(offers, order):
+    offers = rank(offers, order)
+    pages = []
+    for start in range(0, len(offers), PAGE_SIZE):
+        lines = [format_offer(start + position + 1, offer, duplicates)
+                 for position, (offer, duplicates, found_at) in enumerate(offers[start:start + PAGE_SIZE])]
+        pages.append('\n'.join(lines))
+    return [f"{len(offers)} new offers, page {number + 1}/{len(pages)}:\n\n{page}" for number, page in enumerate(pages)]
+
+
+def page_markup(page, pages):
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("◀ Previous", callback_data=f'digest_{page - 1}'))
+    if page < len(pages) - 1:
+        buttons.append(InlineKeyboardButton("Next ▶", callback_data=f'digest_{page + 1}'))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+def send_digests(context: CallbackContext):
+    """
+    This function is run every DIGEST_TICK seconds and sends the digests that are due.
+    The flats of a digest are marked as sent to the user only here, so the ones still
+    buffered when the bot stops can be found again from another site.
+    """
+    now = time.time()
+    with _lock:
+        due = [user_id for user_id, buffer in _buffers.items()
+               if now - buffer['since'] >= db.user_data[user_id]['digest_interval']]
+        buffers = {user_id: _buffers.pop(user_id) for user_id in due}
+
+    for user_id, buffer in buffers.items():
+        sent_clusters = db.seen_offers[(user_id, 'clusters')]
+        # Sent right away in the meantime if the digest was turned off
+        offers = [item for item in buffer['offers'] if item[0].cluster_id not in sent_clusters]
+        if not offers:
+            continue
+        pages = build_pages(offers, db.user_data[user_id]['digest_order'])
+        _pages[user_id] = pages
+        context.bot.send_message(user_id, pages[0], reply_markup=page_markup(0, pages), priority=NOTIFICATION, disable_web_page_preview=True)
+        for offer, duplicates, found_at in offers:
+            sent_clusters.add(offer.cluster_id)
+        logger.info('digest queued user=%s offers=%d pages=%d', user_name(user_id), len(offers), len(pages))
+
+
+# Shows another page of the last digest, pressed on its inline buttons.
+def digest_page(update: Update, context: CallbackContext) -> None:
+    query = update.callback_query
+    page = int(query.data.split('_')[1])
+    pages = _pages.get(query.from_user.id)
+    if not pages or page >= len(pages):
+        query.answer("This digest is no longer available.")
+        return
+    query.answer()
+    query.edit_message_text(pages[page], reply_markup=page_markup(page, pages), disable_web_page_preview=True)
+
+
+# Turns the digest on or off, /digest 30 or /digest 60 collects the offers into one message every 30 or 60 minutes,
+# /digest 60 recent orders it by time instead of price per m², /digest off sends every offer right away.
+def set_digest(update: Update, context: CallbackContext) -> None:
+    user_id = update.message.from_user.id
+    args = context.args or []
+    if not args or args[0] not in DIGEST_INTERVALS or (len(args) > 1 and args[1] not in ORDERS):
+        update.message.reply_text("Please use /digest 30 or /digest 60, optionally followed by price or recent, or /digest off.")
+        return
+
+    interval = DIGEST_INTERVALS[args[0]]
+    db.user_data[user_id]['digest_interval'] = interval
+    if len(args) > 1:
+        db.user_data[user_id]['digest_order'] = ORDERS[args[1]]
+
+    if not interval:
+        update.message.reply_text("Digest turned off, I'll send every new offer right away.", reply_markup=get_markup(db.user_data, user_id))
+        return
+    order = 'price per m²' if db.user_data[user_id]['digest_order'] == 'price_per_m2' else 'newest first'
+    update.message.reply_text(f"I'll send the new offers in one message every {interval // 60} minutes, ordered by {order}.", reply_markup=get_markup(db.user_data, user_id))
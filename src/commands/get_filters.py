@@ -1,7 +1,10 @@
+import logging
 import db_placeholder as db
 from telegram import Update
 from telegram.ext import CallbackContext
 
+logger = logging.getLogger(__name__)
+
 # Function to get the current filters
 def get_filters(update: Update, context: CallbackContext) -> None:
 
@@ -21,8 +24,13 @@ def get_filters(update: Update, context: CallbackContext) -> None:
     offer_type = db.user_data[user_id]['offer_type']
     region = db.user_data[user_id]['region']
     city = db.user_data[user_id]['city']['text_simple']
+    district = db.user_data[user_id]['city'].get('district')
+    radius = db.user_data[user_id]['radius_km']
+    check_interval = db.user_data[user_id]['check_interval']
+    digest_interval = db.user_data[user_id]['digest_interval']
+    digest_order = 'price per m²' if db.user_data[user_id]['digest_order'] == 'price_per_m2' else 'newest first'
 
-    print(f"User {user_name} requested the current filters.") if db.user_data["verbose"] > 0 else None
+    logger.debug('filters requested user=%s', user_name)
     
     context.bot.send_message(
         user_id,
@@ -32,5 +40,9 @@ def get_filters(update: Update, context: CallbackContext) -> None:
         f"Rooms: {', '.join(f'{room}' for room in sorted(selected_rooms))}\n"
         f"Offer type: {offer_type}\n"
         f"Region: {region}\n"
-        f"City: {city}",
+        f"City: {city}"
+        + (f"\nDistrict: {district}" if district else "")
+        + (f"\nRadius: {radius} km" if radius else "")
+        + f"\nChecked every {check_interval // 60} minutes"
+        + (f"\nDigest: every {digest_interval // 60} minutes, {digest_order}" if digest_interval else ""),
     )
\ No newline at end of file
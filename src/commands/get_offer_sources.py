@@ -1,8 +1,11 @@
+import logging
 import db_placeholder as db
 from telegram import Update, ParseMode
 from telegram.ext import CallbackContext
 from src.utils.constants import offer_sources
 
+logger = logging.getLogger(__name__)
+
 
 def get_offer_sources(update: Update, context: CallbackContext) -> None:
     """
@@ -15,7 +18,7 @@ def get_offer_sources(update: Update, context: CallbackContext) -> None:
         user_id = update.callback_query.from_user.id
         user_name = update.callback_query.from_user.first_name
 
-    print(f'user {user_name} requested the list of offer sources') if db.user_data["verbose"] > 0 else None
+    logger.debug('offer sources requested user=%s', user_name)
     
     context.bot.send_message(
         user_id,
@@ -0,0 +1,51 @@
+from uuid import uuid4
+from telegram import Update, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import CallbackContext
+from src.utils.gazetteer import get_place, suggest
+from src.utils.markups import get_markup
+from src.scrappers import scheduler
+import db_placeholder as db
+
+MAX_SUGGESTIONS = 10
+
+
+def place_name(place):
+    if place['district']:
+        return f"{place['city']['text_simple']}, {place['district']['text_district']}"
+    return place['city']['text_simple']
+
+
+# Answers "@bot <city>" typed in any chat with the matching cities and districts.
+def inline_city_search(update: Update, context: CallbackContext) -> None:
+    query = update.inline_query.query
+    results = [
+        InlineQueryResultArticle(
+            id=str(uuid4()),
+            title=place_name(place),
+            description=place['region'],
+            # Choosing a suggestion sends this command to the bot, handled by set_city_command
+            input_message_content=InputTextMessageContent(f"/setcity {place['id']}"),
+        )
+        for place in suggest(query, MAX_SUGGESTIONS)
+    ]
+    update.inline_query.answer(results, cache_time=300, is_personal=False)
+
+
+# Stores the city or district chosen from the inline suggestions.
+def set_city_command(update: Update, context: CallbackContext) -> None:
+    user_id = update.message.from_user.id
+    place = get_place(context.args[0]) if context.args else None
+    if place is None:
+        update.message.reply_text("City not found. Please type @ and my name followed by the city to get suggestions.")
+        return
+
+    city = place['city']
+    location = {"text" : city['text'], "url" : city['url'], "text_simple" : city['text_simple']}
+    if place['district']:
+        location['district'] = place['district']['text_district']
+    db.user_data[user_id]['region'] = place['region']
+    db.user_data[user_id]['city'] = location
+    if db.user_data[user_id]['monitoring']:
+        scheduler.subscribe(user_id)
+
+    update.message.reply_text(f"Location set to {place_name(place)}, {place['region']}.", reply_markup=get_markup(db.user_data, user_id))
@@ -1,120 +1,336 @@
+import logging
+import threading
+import time
 import db_placeholder as db
 from telegram import Update
 from telegram.ext import CallbackContext
 from src.utils.markups import start_menu_markup, stop_monitoring_markup
-from src.scrappers.nieruchomosci_online_scrapper import scrape_nieruchomosci
-from src.scrappers.olx_scrapper import scrape_olx
-from src.scrappers.otodom_scrapper import scrape_otodom
+from src.scrappers.scrape_planner import MAX_PAGES, PAGE_URLS, SITES, user_filters
+from src.scrappers.matcher import SubscriberFilters
+from src.scrappers.duplicates import assign_clusters
+from src.scrappers import scheduler
+from src.scrappers.fetch_engine import fetch_all
+from src.scrappers.host_health import SourceUnavailable
+from src.scrappers.page_cache import NOT_MODIFIED
+from src.utils.outbox import NOTIFICATION
+from src.commands.digest import add_offers
+from src.commands.user_profile import user_name
+from src.utils.metrics import CYCLE_SECONDS, ERRORS, LISTINGS, NEW_OFFERS, PARSE_SECONDS
+from src.utils.logs import get_sampled_logger
 
+logger = logging.getLogger(__name__)
+# Events logged per user and per search, one of every LOG_SAMPLE_EVERY goes through
+sampled_logger = get_sampled_logger(f'{__name__}.sampled')
+
+FIRST_RUN_OFFERS = 5  # newest offers sent per site when the user's searches are checked for the first time
+
+
+
+def send_offer(context: CallbackContext, user_id, site, offer, duplicates=()):
+    """
+    Sends a single offer to the user, formatted for the site it came from.
+    duplicates are the copies of the offer on other sites, listed below it.
+    """
+    if site == 'otodom':
+        text = (
+            f"New offer found on {site}!\n"
+            f"Title: {offer.title}\n"
+            f"Price: {offer.price_text}\n"
+            f"Location: {offer.location}\n"
+            f"Area: {offer.area_text}\n"
+            f"Rooms: {offer.rooms}\n"
+            f"Floor: {offer.floor_text}\n"
+            f"Link: {offer.link}\n"
+        )
+    elif site == 'olx':
+        text = (
+            f"New offer found on {site}!\n"
+            f"Title: {offer.title}\n"
+            f"Price: {offer.price_text}\n"
+            f"Location: {offer.location}\n"
+            f"Updated: {offer.updated_date}\n"
+            f"Area: {offer.area_text}\n"
+            f"Link: {offer.link}\n"
+        )
+    elif site == 'nieruchomosci_online':
+        text = (
+            f"New offer found on {site}!\n"
+            f"Title: {offer.title}\n"
+            f"Price: {offer.price_text}\n"
+            f"Location: {offer.location}\n"
+            f"Area: {offer.area_text}\n"
+            f"Link: {offer.link}\n"
+        )
+    else:
+        return
+    for duplicate in duplicates:
+        text += f"Also on {duplicate.source}: {duplicate.link}\n"
+    context.bot.send_message(user_id, text, priority=NOTIFICATION)
+
+
+def seen_offers_of(user_id, site, filters):
+    """
+    Returns the seen offers index of one search of the user. Every city gets its own index,
+    the pages of a radius user's cities would overflow a shared one and bring old offers back as new.
+    """
+    return db.seen_offers[(user_id, f"{site}:{filters['city']['url']}")]
+
+
+def first_check(user_id, site, seen_offers):
+    # Monitoring was just started for the site, or the search is new, like a city added by a larger radius.
+    # last_seen_offer_{site} is set by the first check of the site, whether any offer matched or not.
+    return not db.user_data[user_id].get(f'last_seen_offer_{site}') or not len(seen_offers)
+
+
+def new_offers(user_id, site, filters, offers, matched, found_now, first_run_left):
+    """
+    Returns the new offers of a shared search that matched the user's filters, newest first,
+    and marks all offers of the page up to the first seen one as seen.
+    matched holds the positions of the offers that passed the user's filters.
+    found_now holds the (user_id, site, link) of offers returned by other searches of this run,
+    so an offer found by overlapping searches is returned once.
+    first_run_left holds the offers still allowed per (user_id, site) for searches checked the first time,
+    so all cities of the user share the FIRST_RUN_OFFERS limit of the site.
+    """
+    found = []
+    seen_offers = seen_offers_of(user_id, site, filters)
+    first_run = first_check(user_id, site, seen_offers)
+
+    for index, offer in enumerate(offers):
+        # Stop as we've reached offers we've seen before
+        if offer.link in seen_offers:
+            break
+        seen_offers.add(offer.link)
+        if (user_id, site, offer.link) in found_now:
+            continue
+        found_now.add((user_id, site, offer.link))
+        if index in matched:
+            found.append(offer)
+
+    if found and first_run:
+        # Limit to the most recent offers
+        left = first_run_left.get((user_id, site), FIRST_RUN_OFFERS)
+        found = found[:left]
+        first_run_left[(user_id, site)] = left - len(found)
+    if found:
+        # Update the last seen offer for this site
+        db.user_data[user_id][f'last_seen_offer_{site}'] = found[0].link
+        NEW_OFFERS.labels(site).inc(len(found))
+    elif offers and not db.user_data[user_id].get(f'last_seen_offer_{site}'):
+        # Nothing matched, the site was checked all the same
+        db.user_data[user_id][f'last_seen_offer_{site}'] = offers[0].link
+    return found
+
+
+def notify_user(context: CallbackContext, user_id, offers):
+    """
+    Sends the user the new offers found by one run, one message per flat: copies of an offer
+    on other sites are merged into the message of the first one, and a flat already sent
+    from another site in an earlier run is not sent again. Users with a digest get the offers
+    buffered for their next digest instead, they count as sent once the digest goes out.
+    """
+    name = user_name(user_id)
+
+    clusters = {}
+    for offer in offers:
+        clusters.setdefault(offer.cluster_id, []).append(offer)
+
+    sent_clusters = db.seen_offers[(user_id, 'clusters')]
+    new_clusters = [(cluster[0], cluster[1:]) for cluster_id, cluster in clusters.items() if cluster_id not in sent_clusters]
+
+    if new_clusters and db.user_data[user_id]['digest_interval']:
+        add_offers(user_id, new_clusters)
+        sampled_logger.info('offers buffered for digest user=%s offers=%d', name, len(new_clusters))
+        return
+
+    for offer, duplicates in new_clusters:
+        sent_clusters.add(offer.cluster_id)
+        send_offer(context, user_id, offer.source, offer, duplicates)
+    sent = len(new_clusters)
+    if sent:
+        sampled_logger.info('offers queued user=%s offers=%d', name, sent)
+    else:
+        sampled_logger.debug('no new offers user=%s', name)
+
+
+def parse_page(site, content):
+    """Parses a fetched page of the site, recording the parse time and the listings found."""
+    started = time.perf_counter()
+    offers = SITES[site][1](content)
+    PARSE_SECONDS.labels(site).observe(time.perf_counter() - started)
+    LISTINGS.labels(site).inc(len(offers))
+    return offers
+
+
+def needs_next_page(site, filters, users, offers):
+    """
+    True when a subscriber may have missed offers behind this page: none of its offers were
+    seen by them before. Users checking for the first time only get the newest offers anyway.
+    """
+    for user_id in users:
+        seen_offers = seen_offers_of(user_id, site, filters)
+        if first_check(user_id, site, seen_offers):
+            continue
+        if not any(offer.link in seen_offers for offer in offers):
+            return True
+    return False
+
+
+def fetch_next_pages(parsed, searches, spent):
+    """
+    Extends the offers of the searches whose page held only new offers with the next result
+    pages, until a page reaches an offer seen before or MAX_PAGES pages were fetched.
+    The pages of all searches are fetched in parallel, one page number per round.
+    spent collects the seconds spent per site.
+    """
+    following = {}
+    if MAX_PAGES > 1:
+        following = {key: 2 for key, offers in parsed.items() if needs_next_page(key[0], searches[key]['filters'], searches[key]['users'], offers)}
+    while following:
+        urls = {key: PAGE_URLS[key[0]](key[1], page) for key, page in following.items()}
+        # Later pages are only fetched after a change of the first, the page cache doesn't apply
+        started = time.perf_counter()
+        pages = fetch_all(urls.values(), conditional=False)
+        fetch_seconds = time.perf_counter() - started
+        for site in {site for site, url in following}:
+            spent[site] += fetch_seconds
+        next_following = {}
+        for key, page in following.items():
+            site, url = key
+            content = pages[urls[key]]
+            started = time.perf_counter()
+            try:
+                if isinstance(content, Exception):
+                    raise content
+                offers = parse_page(site, content)
+            except SourceUnavailable as e:
+                logger.debug('page skipped site=%s page=%d reason=%s', site, page, e)
+                continue
+            except Exception as e:
+                ERRORS.labels('fetch' if isinstance(content, Exception) else 'parse').inc()
+                logger.warning('page failed site=%s page=%d error=%r', site, page, e)
+                continue
+            finally:
+                spent[site] += time.perf_counter() - started
+            # Offers published meanwhile push the others down, skip the ones already on the previous page
+            known = {offer.offer_id for offer in parsed[key]}
+            offers = [offer for offer in offers if offer.offer_id not in known]
+            parsed[key].extend(offers)
+            if offers and page < MAX_PAGES and needs_next_page(site, searches[key]['filters'], searches[key]['users'], offers):
+                next_following[key] = page + 1
+        following = next_following
+
+
+def run_searches(context: CallbackContext, searches):
+    """
+    Fetches every given search once and hands the offers to all its subscribers.
+    Searches marked conditional are skipped when their page didn't change since the last fetch.
+    """
+    logger.debug('run started searches=%d', len(searches))
+    run_started = time.perf_counter()
+
+    # Fetch all searches of all sites in parallel
+    pages = fetch_all(url for (site, url), search in searches.items() if search['conditional'])
+    pages.update(fetch_all((url for (site, url), search in searches.items() if not search['conditional']), conditional=False))
+    # site -> seconds this run spent on it, the fetches ran together so every site waited for all of them
+    spent = dict.fromkeys((site for site, url in searches), time.perf_counter() - run_started)
+
+    # (site, url) -> offers of the search
+    parsed = {}
+    for (site, url), search in searches.items():
+        started = time.perf_counter()
+        try:
+            content = pages[url]
+            if content is NOT_MODIFIED:
+                continue
+            if isinstance(content, Exception):
+                raise content
+            offers = parse_page(site, content)
+        except SourceUnavailable as e:
+            # The other sites go on, this one is retried once the backoff of its host ends
+            logger.debug('search skipped site=%s url=%s reason=%s', site, url, e)
+            continue
+        except Exception as e:
+            ERRORS.labels('fetch' if isinstance(content, Exception) else 'parse').inc()
+            logger.warning('search failed site=%s url=%s error=%r', site, url, e)
+            # Failed fetches count towards the circuit of the host, only a page we can't read concerns the users
+            if not isinstance(content, Exception):
+                for user_id in search['users']:
+                    context.bot.send_message(user_id, "An error occurred while checking for new offers. Please try again later.", reply_markup=stop_monitoring_markup, priority=NOTIFICATION)
+            continue
+        finally:
+            spent[site] += time.perf_counter() - started
+        if offers:
+            parsed[(site, url)] = offers
+
+    fetch_next_pages(parsed, searches, spent)
+
+    found_now = set()
+    first_run_left = {}
+    # user_id -> new offers of all searches of this run, sent together so duplicates across sites are merged
+    found = {}
+    for (site, url), offers in parsed.items():
+        started = time.perf_counter()
+        search = searches[(site, url)]
+        assign_clusters(offers)
+
+        # Match the offers against all subscribers at once
+        subscribers = SubscriberFilters({user_id: user_filters(user_id) for user_id in search['users']})
+        matched = {user_id: set() for user_id in search['users']}
+        for index, user_id in subscribers.match(offers):
+            matched[user_id].add(index)
+
+        for user_id in search['users']:
+            found.setdefault(user_id, []).extend(new_offers(user_id, site, search['filters'], offers, matched[user_id], found_now, first_run_left))
+        spent[site] += time.perf_counter() - started
+
+    for user_id, offers in found.items():
+        try:
+            notify_user(context, user_id, offers)
+        except Exception:
+            ERRORS.labels('notify').inc()
+            logger.exception('notify failed user=%s', user_id)
+
+    for site, seconds in spent.items():
+        CYCLE_SECONDS.labels(site).observe(seconds)
+    CYCLE_SECONDS.labels('all').observe(time.perf_counter() - run_started)
 
 
 def check_new_offers(context: CallbackContext):
-    """This function is run periodically to check for new offers."""
-
-    try:
-        job = context.job
-        user_id = job.context['user_id']
-        user_name = context.bot.get_chat(user_id).first_name
-
-        # Extract user-specific filter parameters
-        filters = {
-            'min_price': db.user_data[user_id]['minimum_price'],
-            'max_price': db.user_data[user_id]['maximum_price'],
-            'owner_type': db.user_data[user_id]['owner_type'],
-            'view_type': db.user_data[user_id]['view_type'],
-            'limit': db.user_data[user_id]['limit'],
-            'area_min': db.user_data[user_id]['area_min'],
-            'area_max': db.user_data[user_id]['area_max'],
-            'selected_rooms': db.user_data[user_id]['selected_rooms'],
-            'by': db.user_data[user_id]['by'],
-            'direction': db.user_data[user_id]['direction'],
-            'days': db.user_data[user_id]['days'],
-            'offer_type': db.user_data[user_id]['offer_type'],
-            'region': db.user_data[user_id]['region'],
-            'city': db.user_data[user_id]['city'],
-
-        }
-
-        # Initialize the sites and corresponding scraping functions
-        sites = {
-            'otodom': scrape_otodom,
-            'olx': scrape_olx,
-            'nieruchomosci_online': scrape_nieruchomosci,
-            # Add other sites and their respective scraping functions here
-            # 'other_site': scrape_other_site_function,
-        }
-
-        print(f'Checking for new offers for user {user_name}...') if db.user_data["verbose"] > 0 else None
-
-        # Loop through each site and scrape offers
-        for site, scrape_function in sites.items():
-            print(f'Checking {site} for new offers for user {user_name}...') if db.user_data["verbose"] > 0 else None
-            
-            offers = scrape_function(filters)
-
-            if offers:
-                new_offers = []
-                last_seen_offer = db.user_data[user_id].get(f'last_seen_offer_{site}')
-
-                for offer in offers:
-                    # Compare with the last seen offer for this specific site
-                    if offer['link'] in db.user_data[user_id]['displayed_offers']:
-                        break
-                    db.user_data[user_id]['displayed_offers'].add(offer['link'])
-                    new_offers.append(offer)
-  # Stop as we've reached offers we've seen before
-
-                if new_offers:
-                    if not last_seen_offer: 
-                        new_offers = new_offers[:5]  # Limit to the 5 most recent offers
-                    for offer in new_offers:
-                        if site == 'otodom':
-                            context.bot.send_message(
-                                user_id,
-                                f"New offer found on {site}!\n"
-                                f"Title: {offer['title']}\n"
-                                f"Price: {offer['price']}\n"
-                                f"Location: {offer['location']}\n"
-                                f"Area: {offer['area']}\n"
-                                f"Rooms: {offer['room_count']}\n"
-                                f"Floor: {offer['floor']}\n"
-                                f"Link: {offer['link']}\n"
-                            )
-                        elif site == 'olx':
-                            context.bot.send_message(
-                                user_id,
-                                f"New offer found on {site}!\n"
-                                f"Title: {offer['title']}\n"
-                                f"Price: {offer['price']}\n"
-                                f"Location: {offer['location']}\n"
-                                f"Updated: {offer['updated_date']}\n"
-                                f"Area: {offer['area']}\n"
-                                f"Link: {offer['link']}\n"
-                            )
-                        elif site == 'nieruchomosci_online':
-                            context.bot.send_message(
-                                user_id,
-                                f"New offer found on {site}!\n"
-                                f"Title: {offer['title']}\n"
-                                f"Price: {offer['price']}\n"
-                                f"Location: {offer['location']}\n"
-                                f"Area: {offer['area']}\n"
-                                f"Link: {offer['link']}\n"
-                            )
-                    # Update the last seen offer for this site
-                    db.user_data[user_id][f'last_seen_offer_{site}'] = new_offers[0]['link']
-
-                else:
-                    print(f"No new offers found on {site}.") if db.user_data["verbose"] > 0 else None
-
-        print("Finished checking all sites.") if db.user_data["verbose"] > 0 else None
-    except Exception as e:
-        print(f"An error occurred: {e}") if db.user_data["verbose"] > 0 else None
-        context.bot.send_message(user_id, "An error occurred while checking for new offers. Please try again later.", reply_markup=stop_monitoring_markup)
+    """This function is run every scheduler tick and runs the searches that are due."""
+    searches = scheduler.due_searches()
+    if searches:
+        run_searches(context, searches)
+
+
+def start_checking(dispatcher):
+    """
+    Runs check_new_offers every scheduler tick on its own thread. A run longer than a tick
+    delays the next one, the JobQueue would skip the ticks in between with a warning each.
+    """
+    global _stop_checking
+    _stop_checking = threading.Event()
+    context = CallbackContext(dispatcher)
+
+    def check_periodically():
+        next_tick = time.monotonic()
+        while not _stop_checking.wait(max(0, next_tick - time.monotonic())):
+            next_tick = time.monotonic() + scheduler.TICK
+            try:
+                check_new_offers(context)
+            except Exception:
+                logger.exception('checking for new offers failed')
+
+    threading.Thread(target=check_periodically, name='check-new-offers', daemon=True).start()
+
+
+def stop_checking():
+    """Stops the checks, a run in progress finishes on its own."""
+    _stop_checking.set()
 
 
 def start_periodic_check(update: Update, context: CallbackContext) -> None:
-    """Starts the periodic job for checking new offers."""
+    """Starts checking for new offers for the user."""
     
     if update.message:
         user_id = update.message.from_user.id
@@ -125,27 +341,19 @@ def start_periodic_check(update: Update, context: CallbackContext) -> None:
 
 
     #check if the user already started the periodic check
-    current_jobs = context.job_queue.get_jobs_by_name(str(user_id))
-    if current_jobs:
+    if db.user_data[user_id]['monitoring']:
         context.bot.send_message(user_id, "I'm already checking for new offers.")
         return
-    context.bot.send_message(user_id, "I'll start checking for new offers every 10 minutes.", reply_markup=stop_monitoring_markup)
-
-    print("Starting periodic check for user", user_name) if db.user_data["verbose"] > 0 else None
-    # Start a job that checks for new offers every 10 minutes
-    job_queue = context.job_queue
-    # Function to execute immediately
-    def run_now(context: CallbackContext):
-        check_new_offers(context)
+    minutes = db.user_data[user_id]['check_interval'] // 60
+    context.bot.send_message(user_id, f"I'll start checking for new offers every {minutes} minutes.", reply_markup=stop_monitoring_markup)
 
-    # Start a job that checks for new offers immediately
-    job_queue = context.job_queue
-    job_queue.run_once(run_now, when=0, context={'user_id': user_id})
-    # Run the job every 10 minutes (including right now)
-    job_queue.run_repeating(check_new_offers, interval=240, first=0, context={'user_id': user_id}, name=str(user_id))
+    logger.info('monitoring started user=%s', user_name)
+    db.user_data[user_id]['monitoring'] = True
+    # Put the user's searches at the front of the scheduler queue to check for new offers immediately
+    scheduler.subscribe(user_id, run_now=True)
 
 def stop_periodic_check(update: Update, context: CallbackContext) -> None:
-    """Stops the periodic job for checking new offers."""
+    """Stops checking for new offers for the user."""
     if update.message:
         user_id = update.message.from_user.id
         user_name = update.message.from_user.first_name
@@ -155,15 +363,11 @@ def stop_periodic_check(update: Update, context: CallbackContext) -> None:
 
     context.bot.send_message(user_id, "I've stopped checking for new offers.", reply_markup=start_menu_markup)
 
-    # Remove the job associated with this user_id
-    current_jobs = context.job_queue.get_jobs_by_name(str(user_id))
+    logger.info('monitoring stopped user=%s', user_name)
+    db.user_data[user_id]['monitoring'] = False
+    scheduler.unsubscribe(user_id)
 
     # Remove last seen offers
     db.user_data[user_id]['last_seen_offer_olx'] = None
     db.user_data[user_id]['last_seen_offer_otodom'] = None
     db.user_data[user_id]['last_seen_offer_nieruchomosci_online'] = None
-
-
-    for job in current_jobs:
-        print(f'Removing job {job}') if db.user_data["verbose"] > 0 else None
-        job.schedule_removal()
\ No newline at end of file
@@ -1,6 +1,10 @@
+import logging
 import db_placeholder as db
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext
+from src.scrappers import scheduler
+
+logger = logging.getLogger(__name__)
 
 
 
@@ -35,7 +39,7 @@ def room_selection(update: Update, context: CallbackContext):
     user_id = query.from_user.id
     user_name = query.from_user.first_name
     selected_rooms = db.user_data[user_id]['selected_rooms']
-    print(f'User {user_name} selected {room_number} rooms.') if db.user_data["verbose"] > 0 else None
+    logger.debug('rooms toggled user=%s rooms=%d', user_name, room_number)
     # Toggle selection
     if room_number in selected_rooms:
         selected_rooms.remove(room_number)
@@ -43,13 +47,14 @@ def room_selection(update: Update, context: CallbackContext):
         selected_rooms.append(room_number)
 
     db.user_data[user_id]['selected_rooms'] = selected_rooms
+    if db.user_data[user_id]['monitoring']:
+        scheduler.subscribe(user_id)
     room_selection_menu(update, context)
 
 def confirm_room_selection(update: Update, context: CallbackContext):
     user_id = update.callback_query.from_user.id
     selected_rooms = db.user_data[user_id]['selected_rooms']
     room_list = ', '.join(f'{room} room(s)' for room in sorted(selected_rooms))
-    db.user_data[user_id]['displayed_offers'] = set()
     context.bot.send_message(update.effective_chat.id, f"You have selected: {room_list}.")
 
 def start_room_selection(update: Update, context: CallbackContext):
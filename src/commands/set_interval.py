@@ -0,0 +1,23 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+from src.utils.markups import get_markup
+import db_placeholder as db
+
+MIN_INTERVAL = 2  # minutes
+MAX_INTERVAL = 60  # minutes
+
+
+# Sets how often the user's searches are checked, /interval 10 to check every 10 minutes.
+def set_interval(update: Update, context: CallbackContext) -> None:
+    user_id = update.message.from_user.id
+    try:
+        minutes = int(context.args[0])
+        if not MIN_INTERVAL <= minutes <= MAX_INTERVAL:
+            raise ValueError
+    except (IndexError, ValueError):
+        update.message.reply_text(f"Please enter the interval in minutes between {MIN_INTERVAL} and {MAX_INTERVAL}, for example /interval 10.")
+        return
+
+    # The scheduler reads the interval whenever it reschedules a search, the new one applies after the next check
+    db.user_data[user_id]['check_interval'] = minutes * 60
+    update.message.reply_text(f"I'll check for new offers every {minutes} minutes.", reply_markup=get_markup(db.user_data, user_id))
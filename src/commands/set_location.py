@@ -4,6 +4,7 @@ from src.utils.markups import cancel_markup, get_markup, choose_region_markup, y
 from src.utils.constants import BTN_CANCEL, BTN_SET_LOCATION
 import db_placeholder as db
 from src.utils.city_checker import find_city_in_region
+from src.scrappers import scheduler
 
 REGION, CITY, SET = range(3)
 
@@ -18,7 +19,12 @@ def set_location_start(update: Update, context: CallbackContext) -> int:
         user_id = update.callback_query.from_user.id
         user_name = update.callback_query.from_user.first_name
 
-    context.bot.send_message(user_id, "Please choose region.", reply_markup=choose_region_markup)
+    context.bot.send_message(
+        user_id,
+        "Please choose region.\n"
+        f"Tip: type @{context.bot.username} followed by a city or district in this chat to pick it from suggestions.",
+        reply_markup=choose_region_markup
+    )
 
     return REGION
 
@@ -56,9 +62,10 @@ def set_location(update: Update, context: CallbackContext) -> int:
     
     db.user_data[user_id]['region'] = region
     db.user_data[user_id]['city'] = {"text" : city['text'], "url" : city['url'], "text_simple" : city['text_simple']}
+    if db.user_data[user_id]['monitoring']:
+        scheduler.subscribe(user_id)
 
     update.message.reply_text(f"Location set to {city['text_simple']}, {region}.", reply_markup=get_markup(db.user_data,user_id))
-    db.user_data[user_id]['displayed_offers'] = set()
     return ConversationHandler.END
 
 def cancel_location(update: Update, context: CallbackContext) -> int:
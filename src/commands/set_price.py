@@ -1,9 +1,12 @@
+import logging
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import CallbackContext, ConversationHandler, CommandHandler, MessageHandler, Filters
 from src.utils.markups import cancel_markup, get_markup
 from src.utils.constants import BTN_PRICE_RANGE, BTN_CANCEL
 import db_placeholder as db
 
+logger = logging.getLogger(__name__)
+
 
 MIN_PRICE, MAX_PRICE = range(2)
 
@@ -18,7 +21,7 @@ def set_price_start(update: Update, context: CallbackContext) -> int:
         user_id = update.callback_query.from_user.id
         user_name = update.callback_query.from_user.first_name
 
-    print(f'user {user_name} started setting the price range') if db.user_data["verbose"] > 0 else None
+    logger.debug('price range started user=%s', user_name)
 
     context.bot.send_message(user_id, "Please enter the minimum price in PLN.", reply_markup=cancel_markup)
     return MIN_PRICE
@@ -62,7 +65,6 @@ def set_max_price(update: Update, context: CallbackContext) -> int:
         db.user_data[user_id]['maximum_price'] = maximum_price
 
         context.bot.send_message(user_id, f"Price range set to {minimum_price} PLN - {maximum_price} PLN.", reply_markup=get_markup(db.user_data,user_id))
-        db.user_data[user_id]['displayed_offers'] = set()
         return ConversationHandler.END
     except ValueError:
         update.message.reply_text("Please enter a valid number for the maximum price.")
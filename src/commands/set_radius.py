@@ -0,0 +1,40 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+from src.utils.markups import get_markup
+from src.utils.gazetteer import locate
+from src.scrappers.scrape_planner import MAX_RADIUS_CITIES, user_filters, user_locations
+from src.scrappers import scheduler
+import db_placeholder as db
+
+MAX_RADIUS = 50  # km
+
+
+# Sets the radius around the current location, /radius 10 to watch everything within 10 km, /radius 0 to turn it off.
+def set_radius(update: Update, context: CallbackContext) -> None:
+    user_id = update.message.from_user.id
+    try:
+        radius = int(context.args[0])
+        if not 0 <= radius <= MAX_RADIUS:
+            raise ValueError
+    except (IndexError, ValueError):
+        update.message.reply_text(f"Please enter the radius in km between 0 and {MAX_RADIUS}, for example /radius 10.")
+        return
+
+    if radius and locate(db.user_data[user_id]['region'], db.user_data[user_id]['city']) is None:
+        update.message.reply_text("I don't know the coordinates of your location, please set the location again.")
+        return
+
+    db.user_data[user_id]['radius_km'] = radius
+    if db.user_data[user_id]['monitoring']:
+        scheduler.subscribe(user_id)
+
+    if not radius:
+        update.message.reply_text("Radius search turned off.", reply_markup=get_markup(db.user_data, user_id))
+        return
+
+    cities = [city['text_simple'] for region, city in user_locations(user_filters(user_id))]
+    update.message.reply_text(
+        f"Watching offers within {radius} km of {db.user_data[user_id]['city']['text_simple']}, "
+        f"in the {MAX_RADIUS_CITIES} nearest places at most:\n" + ', '.join(cities),
+        reply_markup=get_markup(db.user_data, user_id)
+    )
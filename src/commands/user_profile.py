@@ -0,0 +1,23 @@
+import db_placeholder as db
+from telegram import Update
+from telegram.ext import CallbackContext
+
+
+# Runs before every other handler and keeps the sender's name with their settings,
+# so background jobs never have to ask Telegram who a user is.
+def remember_user(update: Update, context: CallbackContext) -> None:
+    user = update.effective_user
+    # Inline queries come from anyone typing the bot's name, not only its users
+    if user is None or update.inline_query:
+        return
+    settings = db.user_data[user.id]
+    # Written only when changed, every write is saved to the database
+    if settings['first_name'] != user.first_name:
+        settings['first_name'] = user.first_name
+    if settings['username'] != user.username:
+        settings['username'] = user.username
+
+
+def user_name(user_id):
+    """Returns the cached first name of the user, or their id when they haven't written since it is cached."""
+    return db.user_data[user_id]['first_name'] or str(user_id)
@@ -0,0 +1,98 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from src.utils.gazetteer import remove_polish_chars
+
+MAX_AGE = 3 * 24 * 60 * 60  # seconds a listing stays in the index after it was last scraped
+NUM_HASHES = 32
+SIMILARITY = 0.3  # share of equal MinHash values from which two close listings are the same flat
+PRICE_TOLERANCE = 0.03  # relative
+AREA_TOLERANCE = 1  # m²
+
+# Random but fixed (a, b) pairs of the hash functions h(x) = (a * x + b) mod PRIME
+PRIME = (1 << 61) - 1
+_COEFFICIENTS = [
+    (int.from_bytes(hashlib.blake2b(f'a{i}'.encode(), digest_size=8).digest(), 'little') % PRIME | 1,
+     int.from_bytes(hashlib.blake2b(f'b{i}'.encode(), digest_size=8).digest(), 'little') % PRIME)
+    for i in range(NUM_HASHES)
+]
+WORD = re.compile(r'\w{3,}')
+
+_lock = threading.Lock()
+# (source, offer_id) -> (cluster_id, price, area, rooms, signature, scraped at), oldest first
+_listings = OrderedDict()
+# rounded area -> keys of the listings having it, the blocking index of the candidates
+_buckets = defaultdict(set)
+
+
+def signature(listing):
+    """MinHash of the words of the title and location."""
+    text = remove_polish_chars(f'{listing.title or ""} {listing.location or ""}')
+    words = {int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), 'little') for word in WORD.findall(text)}
+    if not words:
+        return None
+    return tuple(min((a * word + b) % PRIME for word in words) for a, b in _COEFFICIENTS)
+
+
+def similarity(signature, other):
+    return sum(1 for value, other_value in zip(signature, other) if value == other_value) / NUM_HASHES
+
+
+def _is_duplicate(listing, listing_signature, entry):
+    cluster_id, price, area, rooms, entry_signature, scraped_at = entry
+    if abs(price - listing.price) > PRICE_TOLERANCE * max(price, listing.price):
+        return False
+    if abs(area - listing.area) > AREA_TOLERANCE:
+        return False
+    if rooms is not None and listing.rooms is not None and rooms != listing.rooms:
+        return False
+    return similarity(listing_signature, entry_signature) >= SIMILARITY
+
+
+def _prune(now):
+    while _listings:
+        key, entry = next(iter(_listings.items()))
+        if now - entry[5] <= MAX_AGE:
+            break
+        del _listings[key]
+        bucket = _buckets[round(entry[2])]
+        bucket.discard(key)
+        if not bucket:
+            del _buckets[round(entry[2])]
+
+
+def assign_clusters(listings, now=None):
+    """
+    Sets cluster_id of the listings: the same id for the copies of one flat published on several
+    sites, found by close price, area and rooms and a similar title. Listings scraped before
+    keep their cluster, so only new listings are compared, and only with the same area bucket.
+    """
+    now = now or time.time()
+    with _lock:
+        _prune(now)
+        for listing in listings:
+            key = (listing.source, listing.offer_id)
+            entry = _listings.get(key)
+            if entry is not None:
+                listing.cluster_id = entry[0]
+                _listings[key] = entry[:5] + (now,)
+                _listings.move_to_end(key)
+                continue
+
+            listing.cluster_id = f'{listing.source}:{listing.offer_id}'
+            if listing.price is None or listing.area is None or listing.offer_id is None:
+                continue  # too little to compare, the listing is its own cluster
+
+            listing_signature = signature(listing)
+            bucket = round(listing.area)
+            if listing_signature is not None:
+                candidates = set().union(*(_buckets.get(near, ()) for near in (bucket - 1, bucket, bucket + 1)))
+                for candidate in candidates:
+                    if candidate[0] != listing.source and _is_duplicate(listing, listing_signature, _listings[candidate]):
+                        listing.cluster_id = _listings[candidate][0]
+                        break
+
+            _listings[key] = (listing.cluster_id, listing.price, listing.area, listing.rooms, listing_signature or (), now)
+            _buckets[bucket].add(key)
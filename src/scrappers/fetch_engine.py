@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+from src.scrappers import host_health, http_client, page_cache
+from src.utils.metrics import FETCH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MAX_IN_FLIGHT = 8  # requests running at the same time across all hosts
+PER_HOST_LIMIT = 2  # requests running at the same time against one host
+
+# Created on the shared http loop, so the caps hold across jobs running at the same time
+_in_flight = None
+_host_limits = None
+
+
+async def _fetch(client, url, conditional):
+    global _in_flight, _host_limits
+    if _in_flight is None:
+        _in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+        _host_limits = defaultdict(lambda: asyncio.Semaphore(PER_HOST_LIMIT))
+
+    host = urlsplit(url).hostname
+    # Take the host slot first so a busy host doesn't hold global slots while waiting
+    async with _host_limits[host]:
+        # Checked once the slot is ours, requests queued behind the failing ones are skipped too
+        if not host_health.allow(host):
+            raise host_health.CircuitOpen(f'{host} is skipped until its backoff ends')
+        async with _in_flight:
+            logger.debug('fetching url=%s conditional=%s', url, conditional)
+            headers = page_cache.conditional_headers(url) if conditional else None
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+            except Exception as e:
+                host_health.record_failure(host, type(e).__name__)
+                raise
+            FETCH_SECONDS.labels(host).observe(time.perf_counter() - started)
+            host_health.check(host, response)
+            if not conditional:
+                # Leave the cache alone, the other subscribers of the page haven't seen this version yet
+                return response.content
+            return page_cache.update(url, response)
+
+
+async def _fetch_all(urls, conditional):
+    client = http_client.get_async_client()
+    results = await asyncio.gather(*(_fetch(client, url, conditional) for url in urls), return_exceptions=True)
+    return dict(zip(urls, results))
+
+
+def fetch_all(urls, conditional=True):
+    """
+    Fetches all urls concurrently, blocking until every request is done or timed out.
+    Returns {url: content} where a failed request maps to the exception it raised,
+    a host_health.SourceUnavailable when the portal blocks us or is skipped after failures.
+    With conditional set, a page that didn't change since its last fetch maps to
+    page_cache.NOT_MODIFIED instead of its content.
+    Safe to call from the JobQueue worker threads, the requests run on the shared http loop.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    return http_client.run(_fetch_all(urls, conditional))
@@ -0,0 +1,115 @@
+import logging
+import random
+import re
+import time
+from src.utils.metrics import CIRCUIT_OPEN, ERRORS
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 3  # failed fetches in a row that open the circuit of a host
+BASE_BACKOFF = 60  # seconds the circuit stays open the first time, doubled every time it opens again
+MAX_BACKOFF = 60 * 60  # seconds
+BLOCKED_STATUSES = (403, 429)
+# Challenge pages are small, result pages are hundreds of kB and may load recaptcha for their contact forms
+CHALLENGE_MAX_SIZE = 32 * 1024
+CHALLENGE = re.compile(rb'captcha|cf-chl|challenge-platform|px-block', re.IGNORECASE)
+
+
+class SourceUnavailable(Exception):
+    """The portal didn't serve the page because it blocks us or its circuit is open, not because of the search."""
+
+
+class Blocked(SourceUnavailable):
+    pass
+
+
+class CircuitOpen(SourceUnavailable):
+    pass
+
+
+# host -> {'failures': failed fetches in a row, 'opened': times opened in a row, 'retry_at': ..., 'probing': ...}
+# Only touched from the shared http loop, like the fetches themselves
+_hosts = {}
+
+
+def _state(host):
+    state = _hosts.get(host)
+    if state is None:
+        state = _hosts[host] = {'failures': 0, 'opened': 0, 'retry_at': None, 'probing': False}
+    return state
+
+
+def allow(host):
+    """
+    Returns whether a request to the host may go out. Once the backoff of an open circuit
+    has passed, a single probe request is let through, its outcome closes or reopens the circuit.
+    """
+    state = _state(host)
+    if state['retry_at'] is None:
+        return True
+    if state['probing'] or time.monotonic() < state['retry_at']:
+        return False
+    state['probing'] = True
+    return True
+
+
+def _open(host, state, reason, retry_after=None):
+    # Exponential backoff with jitter, so the instances of the bot don't come back at the same moment
+    backoff = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** state['opened'])
+    delay = random.uniform(backoff / 2, backoff)
+    if retry_after:
+        delay = max(delay, retry_after)
+    state['opened'] += 1
+    state['failures'] = 0
+    state['retry_at'] = time.monotonic() + delay
+    state['probing'] = False
+    CIRCUIT_OPEN.labels(host).set(1)
+    logger.warning('circuit opened host=%s reason=%s seconds=%d times=%d', host, reason, delay, state['opened'])
+
+
+def record_failure(host, reason):
+    """Counts a timeout, connection error or server error, FAILURE_THRESHOLD in a row open the circuit."""
+    state = _state(host)
+    state['failures'] += 1
+    if state['probing'] or state['failures'] >= FAILURE_THRESHOLD:
+        _open(host, state, reason)
+
+
+def record_success(host):
+    state = _hosts.get(host)
+    if state is None:
+        return
+    if state['retry_at'] is not None:
+        logger.info('circuit closed host=%s', host)
+        CIRCUIT_OPEN.labels(host).set(0)
+    state.update(failures=0, opened=0, retry_at=None, probing=False)
+
+
+def _retry_after(response):
+    # Retry-After may also be an http date, the backoff covers that case
+    try:
+        return int(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return None
+
+
+def check(host, response):
+    """
+    Records the outcome of the response. Raises Blocked for a 403, a 429 or a captcha page,
+    which open the circuit right away, and HTTPStatusError for a server error.
+    """
+    if response.status_code in BLOCKED_STATUSES:
+        reason = f'status {response.status_code}'
+    elif response.status_code == 200 and len(response.content) <= CHALLENGE_MAX_SIZE and CHALLENGE.search(response.content):
+        reason = 'captcha'
+    else:
+        reason = None
+    if reason is not None:
+        ERRORS.labels('blocked').inc()
+        _open(host, _state(host), reason, _retry_after(response))
+        raise Blocked(f'{host} answered with a {reason}')
+
+    if response.status_code >= 500:
+        record_failure(host, f'status {response.status_code}')
+        response.raise_for_status()
+    record_success(host)
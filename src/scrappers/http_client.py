@@ -0,0 +1,82 @@
+import asyncio
+import os
+import threading
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# httpx decodes gzip and deflate itself, and brotli as soon as the brotli package is
+# installed - its default Accept-Encoding header follows whatever it can decode.
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+REQUEST_TIMEOUT = 20  # seconds, for every single request
+KEEPALIVE_EXPIRY = 300  # seconds an idle connection is kept, longer than the 240 s check interval
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))  # kept-alive connections shared by all portals
+USE_HTTP2 = HTTP2_AVAILABLE and os.getenv('HTTP2', '1') != '0'
+
+_lock = threading.Lock()
+_loop = None
+_client = None
+_async_client = None
+
+
+def _client_options():
+    return {
+        'headers': HEADERS,
+        'timeout': REQUEST_TIMEOUT,
+        'follow_redirects': True,
+        'http2': USE_HTTP2,
+        'limits': httpx.Limits(
+            max_connections=POOL_SIZE,
+            max_keepalive_connections=POOL_SIZE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_client():
+    """Returns the process wide blocking client, connections to each host are pooled and kept alive."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = httpx.Client(**_client_options())
+    return _client
+
+
+def _get_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='http-client', daemon=True).start()
+    return _loop
+
+
+def get_async_client():
+    """Returns the process wide async client. Only use it from coroutines passed to run()."""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(**_client_options())
+    return _async_client
+
+
+def run(coro):
+    """
+    Runs the coroutine on the shared http event loop and waits for its result.
+    The loop lives for the whole process so the async client keeps its connections between cycles.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def close():
+    """Closes both clients, called when the bot shuts down."""
+    global _client, _async_client
+    if _async_client is not None:
+        run(_async_client.aclose())
+        _async_client = None
+    if _client is not None:
+        _client.close()
+        _client = None
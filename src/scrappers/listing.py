@@ -0,0 +1,129 @@
+import re
+from src.utils.seen_offers import offer_id
+
+FLOORS = {'parter': 0, 'suterena': -1}
+# '2 pokoje', '3-pokojowe', '2 pok.', 'dwupokojowe', 'trzy pokojowe', 'kawalerka'
+ROOMS_IN_TITLE = re.compile(
+    r'(?:\b(\d{1,2})|\b(jedno|dwu|trzy|cztero|pięcio))\s*-?\s*pok(?:oj|oi|ój|\.|\b)|\b(kawaler)(?:k|ce)',
+    re.IGNORECASE,
+)
+ROOM_WORDS = {'jedno': 1, 'dwu': 2, 'trzy': 3, 'cztero': 4, 'pięcio': 5}
+
+
+def parse_number(text):
+    """'3 200 zł' -> 3200.0, '45,5 m²' -> 45.5, '10+ pokoi' -> 10.0, None when there is no number."""
+    if not text:
+        return None
+    match = re.search(r'\d[\d\s]*(?:[.,]\d+)?', text)
+    if not match:
+        return None
+    return float(re.sub(r'\s', '', match.group()).replace(',', '.'))
+
+
+def rooms_in_title(title):
+    """'Dwupokojowe mieszkanie' -> 2, 'Kawalerka na Woli' -> 1, None when the title doesn't say."""
+    match = ROOMS_IN_TITLE.search(title)
+    if not match:
+        return None
+    number, word, studio = match.groups()
+    if number:
+        return int(number)
+    return ROOM_WORDS[word.lower()] if word else 1
+
+
+def parse_floor(text):
+    """'3 piętro' or '3' -> 3, 'parter' -> 0, 'suterena' -> -1, '> 10' -> 11, None when unknown."""
+    if not text:
+        return None
+    text = text.strip().lower()
+    if text in FLOORS:
+        return FLOORS[text]
+    number = parse_number(text)
+    if number is None:
+        return None
+    return int(number) + 1 if text.startswith('>') else int(number)
+
+
+class Listing:
+    """
+    One offer as returned by every scraper, with price, area, rooms and floor parsed once
+    at scrape time so a fetched page can be filtered for many users without re-parsing.
+    """
+    __slots__ = (
+        'source', 'offer_id', 'title', 'link', 'location', 'price', 'area', 'rooms', 'floor', 'updated_date', 'created_at', 'cluster_id',
+        'price_label', 'area_label', 'floor_label',
+    )
+
+    def __init__(self, source, title, link, location=None, price=None, area=None, rooms=None, floor=None, updated_date=None, created_at=None,
+                 price_label=None, area_label=None, floor_label=None):
+        self.source = source
+        self.offer_id = offer_id(link) if link else None
+        self.title = title
+        self.link = link
+        self.location = location
+        self.price = price  # int, PLN
+        self.area = area  # float, m²
+        self.rooms = rooms  # int
+        self.floor = floor  # int, 0 for the ground floor
+        self.updated_date = updated_date
+        self.created_at = created_at
+        self.cluster_id = None  # shared by the copies of the offer on other sites, set by duplicates.assign_clusters
+        # The portal's text of a value that couldn't be parsed, like 'Zapytaj o cenę', shown instead of it
+        self.price_label = price_label
+        self.area_label = area_label
+        self.floor_label = floor_label
+
+    @classmethod
+    def from_raw(cls, source, raw):
+        """Builds the listing from a parser's dict of strings, preferring its structured values if it has them."""
+        price = raw.get('price_value')
+        if price is None:
+            price = parse_number(raw.get('price'))
+        area = raw.get('area_value')
+        if area is None:
+            area = parse_number(raw.get('area'))
+        rooms = raw.get('rooms')
+        if rooms is None:
+            rooms = parse_number(raw.get('room_count'))
+        if rooms is None and raw.get('title'):
+            # OLX cards don't show the rooms, but the titles usually do
+            rooms = rooms_in_title(raw['title'])
+        floor = parse_floor(raw.get('floor'))
+
+        return cls(
+            source,
+            title=raw.get('title'),
+            link=raw.get('link'),
+            location=raw.get('location'),
+            price=int(price) if price is not None else None,
+            area=float(area) if area is not None else None,
+            rooms=int(rooms) if rooms is not None else None,
+            floor=floor,
+            updated_date=raw.get('updated_date'),
+            created_at=raw.get('created_at'),
+            price_label=raw.get('price') if price is None else None,
+            area_label=raw.get('area') if area is None else None,
+            floor_label=raw.get('floor') if floor is None else None,
+        )
+
+    @property
+    def price_text(self):
+        return f"{self.price:,} zł".replace(',', ' ') if self.price is not None else self.price_label
+
+    @property
+    def area_text(self):
+        return f"{self.area:g} m²" if self.area is not None else self.area_label
+
+    @property
+    def floor_text(self):
+        # In the portals' words, like the rest of the message
+        if self.floor is None:
+            return self.floor_label
+        if self.floor == 0:
+            return 'parter'
+        if self.floor < 0:
+            return 'suterena'
+        return '> 10' if self.floor > 10 else str(self.floor)
+
+    def __repr__(self):
+        return f'Listing({self.source}, {self.offer_id}, {self.price}, {self.area}, {self.rooms})'
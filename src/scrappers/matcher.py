@@ -0,0 +1,103 @@
+from array import array
+from src.utils.gazetteer import remove_polish_chars
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _rooms_bit(rooms):
+    # 1, 2, 3 and 4+ rooms, like the room selection menu
+    return 1 << (min(max(rooms, 1), 4) - 1)
+
+
+class SubscriberFilters:
+    """
+    The price, area, room and district filters of all subscribers of one search, stored as columns
+    so a page of listings is matched against every subscriber in one vectorised pass per listing.
+    Uses NumPy when installed and plain arrays otherwise.
+    """
+    __slots__ = ('user_ids', 'min_price', 'max_price', 'area_min', 'area_max', 'rooms', 'district', 'districts')
+
+    def __init__(self, filters_by_user):
+        """filters_by_user: {user_id: filters} as returned by scrape_planner.user_filters"""
+        self.user_ids = list(filters_by_user)
+        filters = [filters_by_user[user_id] for user_id in self.user_ids]
+
+        # Every distinct district once, the users point at it by position, -1 for no district
+        self.districts = []
+        positions = {}
+        district = array('i')
+        for user_filters in filters:
+            name = user_filters.get('district') if not user_filters.get('radius_km') else None
+            if name:
+                name = remove_polish_chars(name)
+                if name not in positions:
+                    positions[name] = len(self.districts)
+                    self.districts.append(name)
+                district.append(positions[name])
+            else:
+                district.append(-1)
+
+        columns = {
+            'min_price': array('d', (float(user_filters['min_price']) for user_filters in filters)),
+            'max_price': array('d', (float(user_filters['max_price']) for user_filters in filters)),
+            'area_min': array('d', (float(user_filters['area_min']) for user_filters in filters)),
+            'area_max': array('d', (float(user_filters['area_max']) for user_filters in filters)),
+            'rooms': array('B', (sum(_rooms_bit(room) for room in set(user_filters['selected_rooms'])) for user_filters in filters)),
+            'district': district,
+        }
+        for name, column in columns.items():
+            setattr(self, name, np.frombuffer(column, dtype=column.typecode) if np is not None else column)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def _district_matches(self, listing):
+        # Unknown locations pass, like every other unknown value
+        if not listing.location:
+            return [True] * len(self.districts)
+        location = remove_polish_chars(listing.location)
+        return [name in location for name in self.districts]
+
+    def match(self, listings):
+        """
+        Returns the deliveries as [(listing index, user_id)], in listing order.
+        Unknown values of a listing pass the corresponding filter.
+        """
+        if np is None:
+            return self._match_python(listings)
+
+        deliveries = []
+        for index, listing in enumerate(listings):
+            mask = np.ones(len(self.user_ids), dtype=bool)
+            if listing.price is not None:
+                mask &= (self.min_price <= listing.price) & (listing.price <= self.max_price)
+            if listing.area is not None:
+                mask &= (self.area_min <= listing.area) & (listing.area <= self.area_max)
+            if listing.rooms is not None:
+                mask &= (self.rooms & _rooms_bit(listing.rooms)) != 0
+            if self.districts:
+                # Position -1 picks the appended True: users without a district always pass
+                district_ok = np.array(self._district_matches(listing) + [True])
+                mask &= district_ok[self.district]
+            deliveries.extend((index, self.user_ids[user]) for user in np.flatnonzero(mask))
+        return deliveries
+
+    def _match_python(self, listings):
+        deliveries = []
+        for index, listing in enumerate(listings):
+            district_ok = self._district_matches(listing) + [True]
+            rooms_bit = _rooms_bit(listing.rooms) if listing.rooms is not None else None
+            for user, user_id in enumerate(self.user_ids):
+                if listing.price is not None and not self.min_price[user] <= listing.price <= self.max_price[user]:
+                    continue
+                if listing.area is not None and not self.area_min[user] <= listing.area <= self.area_max[user]:
+                    continue
+                if rooms_bit is not None and not self.rooms[user] & rooms_bit:
+                    continue
+                if not district_ok[self.district[user]]:
+                    continue
+                deliveries.append((index, user_id))
+        return deliveries
@@ -1,6 +1,11 @@
-import requests
+import logging
 from bs4 import BeautifulSoup
 import urllib
+from src.scrappers.http_client import get_client
+from src.scrappers.parser_backend import get_backend, parse_html, has_class, first
+from src.scrappers.listing import Listing
+
+logger = logging.getLogger(__name__)
 
 
 # https://www.nieruchomosci-online.pl/szukaj.html?3,mieszkanie,wynajem,,Warszawa:20571,,,,1000-2500,40-70,,,,,,1-4
@@ -42,12 +47,57 @@ def build_url(filters):
 
     return url
 
+def page_url(url, page):
+    """Returns the url of the given result page of a search, page 1 being the url itself."""
+    return url if page == 1 else f"{url}&p={page}"
+
+
 def scrape_nieruchomosci(filters):
     url = build_url(filters)
 
-    print("Requesting", url) 
-    response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-    soup = BeautifulSoup(response.content, 'html.parser')
+    logger.debug('fetching url=%s', url)
+    response = get_client().get(url)
+    return parse_nieruchomosci(response.content)
+
+
+def parse_nieruchomosci(content, backend=None):
+    if get_backend(backend) == 'lxml':
+        listings = _parse_nieruchomosci_lxml(content)
+    else:
+        listings = _parse_nieruchomosci_bs4(content)
+    # Offers are told apart by their link, a listing without one is dropped
+    return [Listing.from_raw('nieruchomosci_online', listing) for listing in listings if listing['link']]
+
+
+def _parse_nieruchomosci_lxml(content):
+    tree = parse_html(content)
+
+    listings = []
+
+    rental_offers = tree.xpath('//div[@class="tile tile-tile"]')
+
+    for offer in rental_offers:
+        name_tag = first(offer.xpath(f'.//h2[{has_class("name")}]'))
+        title = name_tag.text_content().strip()
+        link = first(name_tag.xpath('.//a')).get('href')
+        location = first(offer.xpath(f'.//p[{has_class("province")}]')).text_content().strip().replace('\n', ' ')
+        price_tag = first(offer.xpath('.//p[@class="title-a primary-display"]'))
+        price = price_tag.xpath('.//span')[0].text_content().strip()
+        area = first(price_tag.xpath(f'.//span[{has_class("area")}]')).text_content().strip()
+
+        listings.append({
+            'title': title,
+            'link': link,
+            'location': location,
+            'price': price,
+            'area': area
+        })
+
+    return listings
+
+
+def _parse_nieruchomosci_bs4(content):
+    soup = BeautifulSoup(content, 'html.parser')
 
     listings = []
 
@@ -1,6 +1,11 @@
+import logging
 from bs4 import BeautifulSoup
 import sys
-import requests
+from src.scrappers.http_client import get_client
+from src.scrappers.parser_backend import get_backend, parse_html, has_class, first
+from src.scrappers.listing import Listing
+
+logger = logging.getLogger(__name__)
 
 # <div class="css-wsrviy" data-testid="qa-header-message"><div class="css-1kbfsd9"></div><div><p class="css-8gj8ho"></p><p class="css-196yitg">Nie znaleźliśmy żadnych wyników, ale poniżej znajdziesz ogłoszenia powiązane z ostatnio oglądanymi ogłoszeniami:</p></div></div>
 
@@ -64,11 +69,81 @@ def build_url(filters):
 
 
 
+def page_url(url, page):
+    """Returns the url of the given result page of a search, page 1 being the url itself."""
+    return url if page == 1 else f"{url.rstrip('&')}&page={page}"
+
+
 def scrape_olx(filters):
     url = build_url(filters)
-    print("Requesting", url) 
-    response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-    soup = BeautifulSoup(response.content, 'html.parser')
+    logger.debug('fetching url=%s', url)
+    response = get_client().get(url)
+    return parse_olx(response.content)
+
+
+def parse_olx(content, backend=None):
+    if get_backend(backend) == 'lxml':
+        listings = _parse_olx_lxml(content)
+    else:
+        listings = _parse_olx_bs4(content)
+    # Offers are told apart by their link, a listing without one is dropped
+    return [Listing.from_raw('olx', listing) for listing in listings if listing['link']]
+
+
+def _parse_olx_lxml(content):
+    tree = parse_html(content)
+
+    listings = []
+
+    if tree.xpath(f'//div[{has_class("css-wsrviy")}]'):
+        return listings
+
+    # Find all listings by selecting the main div that holds each offer
+    offers = tree.xpath(f'//div[{has_class("css-1g5933j")}]')
+
+    for offer in offers:
+        if offer.xpath('.//div[@data-testid="adCard-featured"]'):
+            continue
+
+        # Extract the title
+        title_tag = first(offer.xpath(f'.//h6[{has_class("css-1wxaaza")}]'))
+        title = title_tag.text_content().strip() if title_tag is not None else None
+
+        # Extract the link
+        link_tag = first(offer.xpath(f'.//a[{has_class("css-z3gu2d")}]'))
+        link = link_tag.get('href') if link_tag is not None else None
+
+        #ignore link to otodom, and cards without a link
+        if not link or 'otodom' in link:
+            continue
+
+        # Extract the price
+        price_tag = first(offer.xpath(f'.//p[{has_class("css-13afqrm")}]'))
+        price = price_tag.text_content().strip().replace(u'\xa0', ' ') if price_tag is not None else None
+
+        # Extract the location and date
+        location_date_tag = first(offer.xpath(f'.//p[{has_class("css-1mwdrlh")}]'))
+        location_date = location_date_tag.text_content().strip() if location_date_tag is not None else None
+        location, updated_date = location_date.split(' - ') if location_date and ' - ' in location_date else (location_date, None)
+
+        # Extract the area
+        area_tag = first(offer.xpath(f'.//span[{has_class("css-643j0o")}]'))
+        area = area_tag.text_content().strip() if area_tag is not None else None
+
+        listings.append({
+            'title': title,
+            'link': f"https://www.olx.pl{link}" if link else None,
+            'price': price,
+            'location': location,
+            'updated_date': updated_date,
+            'area': area
+        })
+
+    return listings
+
+
+def _parse_olx_bs4(content):
+    soup = BeautifulSoup(content, 'html.parser')
 
 
 
@@ -93,8 +168,8 @@ def scrape_olx(filters):
         link_tag = offer.find('a', class_='css-z3gu2d')
         link = link_tag['href'] if link_tag else None
 
-        #ignore link to otodom
-        if 'otodom' in link:
+        #ignore link to otodom, and cards without a link
+        if not link or 'otodom' in link:
             continue
 
         # Extract the price
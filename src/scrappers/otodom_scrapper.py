@@ -1,6 +1,18 @@
+import logging
 from bs4 import BeautifulSoup
+import re
 import sys
-import requests
+from src.scrappers.http_client import get_client
+from src.scrappers.parser_backend import get_backend, parse_html, first
+from src.scrappers.listing import Listing
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    from json import loads as json_loads
 
 # selected_rooms = [2,3]
 # selected_rooms_url = '%5BTWO%2CTHREE%5D'
@@ -60,14 +72,147 @@ def build_url(filters):
 
 
 
+def page_url(url, page):
+    """Returns the url of the given result page of a search, page 1 being the url itself."""
+    return url if page == 1 else f"{url}&page={page}"
+
+
 def scrape_otodom(filters):
     # url = offer_sources[0]['url']
     url = build_url(filters)
-    print("Requesting", url) 
-    response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
+    logger.debug('fetching url=%s', url)
+    response = get_client().get(url)
+    return parse_otodom(response.content)
+
+
+def parse_otodom(content, backend=None):
+    # Otodom embeds the whole search result as json, walking the DOM is the fallback
+    listings = _parse_otodom_next_data(content)
+    if listings is None:
+        if get_backend(backend) == 'lxml':
+            listings = _parse_otodom_lxml(content)
+        else:
+            listings = _parse_otodom_bs4(content)
+    # Offers are told apart by their link, a listing without one is dropped
+    return [Listing.from_raw('otodom', listing) for listing in listings if listing['link']]
+
+
+NEXT_DATA_PATTERN = re.compile(rb'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL)
+
+ROOMS_NUMBERS = {
+    'ONE': '1', 'TWO': '2', 'THREE': '3', 'FOUR': '4', 'FIVE': '5',
+    'SIX': '6', 'SEVEN': '7', 'EIGHT': '8', 'NINE': '9', 'TEN': '10', 'MORE': '10+',
+}
+
+FLOOR_NUMBERS = {
+    'CELLAR': 'suterena', 'GROUND': 'parter', 'FIRST': '1', 'SECOND': '2', 'THIRD': '3',
+    'FOURTH': '4', 'FIFTH': '5', 'SIXTH': '6', 'SEVENTH': '7', 'EIGHTH': '8', 'NINTH': '9',
+    'TENTH': '10', 'ABOVE_TENTH': '> 10', 'GARRET': 'poddasze',
+}
+
+
+def _format_price(price):
+    if not price or price.get('value') is None:
+        return None
+    currency = 'zł' if price.get('currency') == 'PLN' else price.get('currency')
+    return f"{price['value']:,} {currency}".replace(',', ' ')
+
+
+def _format_location(location):
+    geocoded = (location.get('reverseGeocoding') or {}).get('locations') or []
+    if geocoded:
+        return geocoded[-1].get('fullName')
+    address = location.get('address') or {}
+    parts = [(address.get(part) or {}).get('name') for part in ('street', 'city', 'province')]
+    return ', '.join(part for part in parts if part) or None
+
+
+def _parse_otodom_next_data(content):
+    """
+    Reads the listings from the embedded __NEXT_DATA__ json without building a DOM.
+    Returns None when the page has no such blob or its layout is unknown.
+    """
+    if isinstance(content, str):
+        content = content.encode()
+    match = NEXT_DATA_PATTERN.search(content)
+    if not match:
+        return None
+
+    try:
+        items = json_loads(match.group(1))['props']['pageProps']['data']['searchAds']['items']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    listings = []
+    for item in items:
+        if item.get('isPromoted'):
+            continue
+
+        price = item.get('totalPrice')
+        area = item.get('areaInSquareMeters')
+        rooms = ROOMS_NUMBERS.get(item.get('roomsNumber'))
+
+        listings.append({
+            'title': item.get('title'),
+            'link': f"https://www.otodom.pl/pl/oferta/{item['slug']}" if item.get('slug') else None,
+            'price': _format_price(price),
+            'location': _format_location(item.get('location') or {}),
+            'room_count': rooms,
+            'area': f"{area} m²" if area is not None else None,
+            'floor': FLOOR_NUMBERS.get(item.get('floorNumber')),
+            # Structured values the DOM doesn't give us
+            'price_value': price.get('value') if price else None,
+            'area_value': area,
+            'rooms': int(rooms.rstrip('+')) if rooms else None,
+            'created_at': item.get('dateCreatedFirst') or item.get('dateCreated'),
+        })
+
+    return listings
+
+
+def _parse_otodom_lxml(content):
+    tree = parse_html(content)
+
+    listings = []
+
+    # Find all listings, skipping the first 3 sections
+    sections = tree.xpath('//section[@class="eeungyz1 css-hqx1d9 e12fn6ie0"]')
+    for section in sections[3:]:
+        # Extract the title and the link
+        title_tag = first(section.xpath('.//a[@class="css-16vl3c1 e17g0c820"]'))
+        title = title_tag.text_content().strip() if title_tag is not None else None
+        link = title_tag.get('href') if title_tag is not None else None
+
+        # Extract the price
+        price_tag = first(section.xpath('.//span[@class="css-2bt9f1 evk7nst0"]'))
+        price = price_tag.text_content().strip().replace(u'\xa0', ' ') if price_tag is not None else None
+
+        # Extract the location
+        location_tag = first(section.xpath('.//p[@class="css-42r2ms eejmx80"]'))
+        location = location_tag.text_content().strip() if location_tag is not None else None
+
+        # Extract room count, area, and floor
+        details = first(section.xpath('.//div[@class="css-1c1kq07 e1clni9t0"]'))
+        values = details.xpath('.//dd')
+        room_count = values[0].text_content() if details.xpath('.//dt')[0].text_content() == 'Liczba pokoi' else None
+        area = values[1].text_content() if len(values) > 1 else None
+        floor = values[2].text_content() if len(values) > 2 else None
+
+        listings.append({
+            'title': title,
+            'link': f"https://www.otodom.pl{link}" if link else None,
+            'price': price,
+            'location': location,
+            'room_count': room_count,
+            'area': area,
+            'floor': floor
+        })
+
+    return listings
 
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+def _parse_otodom_bs4(content):
+    soup = BeautifulSoup(content, 'html.parser')
 
 
     listings = []
@@ -0,0 +1,61 @@
+import hashlib
+import time
+
+MAX_AGE = 24 * 60 * 60  # seconds an url that isn't fetched anymore stays in the cache
+
+# Sentinel returned instead of the page content when the page didn't change since the last fetch
+NOT_MODIFIED = object()
+
+# url -> {'etag': ..., 'last_modified': ..., 'hash': ..., 'fetched_at': ...}
+_pages = {}
+
+
+def conditional_headers(url):
+    """Returns the If-None-Match / If-Modified-Since headers for the previous fetch of the url."""
+    page = _pages.get(url)
+    headers = {}
+    if page is None:
+        return headers
+    if page['etag']:
+        headers['If-None-Match'] = page['etag']
+    if page['last_modified']:
+        headers['If-Modified-Since'] = page['last_modified']
+    return headers
+
+
+def update(url, response):
+    """
+    Stores the validators and the body hash of the response.
+    Returns the page content, or NOT_MODIFIED when the server answered 304
+    or sent exactly the same body as last time.
+    """
+    now = time.monotonic()
+    page = _pages.get(url)
+
+    if response.status_code == 304 and page is not None:
+        page['fetched_at'] = now
+        return NOT_MODIFIED
+
+    content = response.content
+    if response.status_code != 200:
+        return content
+
+    body_hash = hashlib.blake2b(content, digest_size=16).digest()
+    unchanged = page is not None and page['hash'] == body_hash
+
+    _pages[url] = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'hash': body_hash,
+        'fetched_at': now,
+    }
+    if page is None:
+        _prune(now)
+
+    return NOT_MODIFIED if unchanged else content
+
+
+def _prune(now):
+    # Drop the searches nobody is watching anymore
+    for url in [url for url, page in _pages.items() if now - page['fetched_at'] > MAX_AGE]:
+        del _pages[url]
@@ -0,0 +1,37 @@
+import os
+
+try:
+    import lxml.html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# 'lxml' walks only the listing containers of a C-parsed tree,
+# 'bs4' is the original BeautifulSoup html.parser implementation kept for A/B verification.
+BACKENDS = ('lxml', 'bs4')
+
+
+def get_backend(backend=None):
+    """Returns the backend to use: the one asked for, else PARSER_BACKEND, else lxml when installed."""
+    backend = backend or os.getenv('PARSER_BACKEND') or ('lxml' if LXML_AVAILABLE else 'bs4')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend {backend}, expected one of {BACKENDS}")
+    if backend == 'lxml' and not LXML_AVAILABLE:
+        return 'bs4'
+    return backend
+
+
+def parse_html(content):
+    """Parses a page with lxml. The portals serve utf-8, so bytes are decoded as such."""
+    if isinstance(content, bytes):
+        return lxml.html.document_fromstring(content, parser=lxml.html.HTMLParser(encoding='utf-8'))
+    return lxml.html.document_fromstring(content)
+
+
+def has_class(name):
+    """XPath predicate matching elements that have the class among others, like bs4's class_='name'."""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+def first(elements):
+    return elements[0] if elements else None
@@ -0,0 +1,157 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+import db_placeholder as db
+from src.scrappers.scrape_planner import user_searches
+
+TICK = 1  # seconds between two runs of the scheduler job
+JITTER = 0.1  # every search is rescheduled within +-10% of its interval
+# Budget of searches started per second, by default the rate the scheduled searches need plus the jitter
+SCRAPES_PER_SECOND = float(os.getenv('SCRAPES_PER_SECOND', 0))
+MIN_SCRAPES_PER_SECOND = 2  # the default budget never goes below this, so new users' first checks start right away
+
+# The queue holds every distinct (site, url) once, for all users subscribed to it.
+# (site, url) -> {'filters': ..., 'users': {user_id, ...}, 'due': ..., 'conditional': ..., 'rate': ...}
+_searches = {}
+# user_id -> (site, url) keys the user is subscribed to
+_user_searches = {}
+# (due, sequence, (site, url)), entries whose due no longer matches _searches are stale
+_queue = []
+_sequence = itertools.count()
+_lock = threading.Lock()
+_budget = 0
+_last_tick = None
+# Searches per second the scheduled searches need, the sum of their rates
+_demand = 0
+
+
+def _interval(search):
+    # A search shared by users with different intervals runs as often as the most eager one wants
+    return min(db.user_data[user_id]['check_interval'] for user_id in search['users'])
+
+
+def _update_rate(search):
+    """Refreshes the share of the search in the demand from its users' intervals, returns the interval."""
+    global _demand
+    interval = _interval(search)
+    _demand += 1 / interval - search['rate']
+    search['rate'] = 1 / interval
+    return interval
+
+
+def _push(key, due):
+    _searches[key]['due'] = due
+    heapq.heappush(_queue, (due, next(_sequence), key))
+
+
+def subscribe(user_id, run_now=False):
+    """
+    Subscribes the user to the searches of their current filters, dropping the old ones.
+    Call it again whenever the location or offer type changes. New searches get a random
+    start within their interval so searches don't fire in sync, the same one for all of them
+    so the sites of a new location are checked together, unless run_now is set: then the
+    user's searches go to the front of the queue and skip the page cache once.
+    """
+    now = time.monotonic()
+    with _lock:
+        searches = user_searches(user_id)
+        for key in _user_searches.get(user_id, set()) - searches.keys():
+            _remove_user(key, user_id)
+        _user_searches[user_id] = set(searches)
+
+        start = random.uniform(0, 1)
+        for key, filters in searches.items():
+            search = _searches.get(key)
+            if search is None:
+                search = _searches[key] = {'filters': filters, 'users': set(), 'due': None, 'conditional': True, 'rate': 0}
+            search['users'].add(user_id)
+            interval = _update_rate(search)
+
+            if run_now:
+                search['conditional'] = False
+                _push(key, now)
+            elif search['due'] is None:
+                _push(key, now + start * interval)
+
+
+def unsubscribe(user_id):
+    """Removes the user from all their searches, a search nobody watches leaves the queue."""
+    with _lock:
+        for key in _user_searches.pop(user_id, set()):
+            _remove_user(key, user_id)
+
+
+def _remove_user(key, user_id):
+    global _demand
+    search = _searches.get(key)
+    if search is None:
+        return
+    search['users'].discard(user_id)
+    if search['users']:
+        _update_rate(search)
+    else:
+        _demand -= search['rate']
+        del _searches[key]
+
+
+def load(user_ids):
+    """Subscribes all users that had monitoring on, spread over their intervals."""
+    for user_id in user_ids:
+        subscribe(user_id)
+
+
+def due_searches():
+    """
+    Pops the searches that are due, at most as many as the budget allows, and reschedules them.
+    Returns {(site, url): {'filters': ..., 'users': {user_id, ...}, 'conditional': ...}}, the offers
+    are grouped per user only when notifying.
+    """
+    global _budget, _last_tick
+    now = time.monotonic()
+    rate = scrape_rate()
+    # Token bucket holding at most one tick worth of scrapes
+    _budget = min(_budget + (now - _last_tick if _last_tick else TICK) * rate, max(rate * TICK, 1))
+    _last_tick = now
+
+    due = {}
+    with _lock:
+        while _queue and _queue[0][0] <= now and _budget >= 1:
+            due_at, sequence, key = heapq.heappop(_queue)
+            search = _searches.get(key)
+            if search is None or search['due'] != due_at:
+                continue  # stale entry
+            _budget -= 1
+            due[key] = {'filters': search['filters'], 'users': set(search['users']), 'conditional': search['conditional']}
+            search['conditional'] = True
+            # The users' intervals may have changed since the last check
+            _push(key, now + _update_rate(search) * random.uniform(1 - JITTER, 1 + JITTER))
+    return due
+
+
+def scrape_rate():
+    """Returns the searches started per second: SCRAPES_PER_SECOND if set, or what the scheduled searches need."""
+    return SCRAPES_PER_SECOND or max(_demand * (1 + JITTER), MIN_SCRAPES_PER_SECOND)
+
+
+def backlog():
+    """Returns the number of searches that are due but wait for the scrape budget."""
+    now = time.monotonic()
+    with _lock:
+        return sum(1 for search in _searches.values() if search['due'] <= now)
+
+
+def lag():
+    """Returns how many seconds the longest waiting due search is late, 0 when nothing waits."""
+    now = time.monotonic()
+    with _lock:
+        due = [search['due'] for search in _searches.values() if search['due'] <= now]
+    return now - min(due) if due else 0
+
+
+def size():
+    """Returns the number of scheduled searches and of subscribed users."""
+    with _lock:
+        return len(_searches), len(_user_searches)
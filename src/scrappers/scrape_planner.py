@@ -0,0 +1,116 @@
+import db_placeholder as db
+from src.utils.constants import DEFAULT_USER_DATA
+from src.utils.gazetteer import locate, cities_within
+from src.scrappers.nieruchomosci_online_scrapper import parse_nieruchomosci, build_url as build_nieruchomosci_url, page_url as nieruchomosci_page_url
+from src.scrappers.olx_scrapper import parse_olx, build_url as build_olx_url, page_url as olx_page_url
+from src.scrappers.otodom_scrapper import parse_otodom, build_url as build_otodom_url, page_url as otodom_page_url
+
+# Initialize the sites with their url building and page parsing functions
+SITES = {
+    'otodom': (build_otodom_url, parse_otodom),
+    'olx': (build_olx_url, parse_olx),
+    'nieruchomosci_online': (build_nieruchomosci_url, parse_nieruchomosci),
+    # Add other sites and their respective functions here
+    # 'other_site': (build_other_site_url, parse_other_site),
+}
+
+# Urls of the following result pages of a search, fetched while a page holds only new offers
+PAGE_URLS = {
+    'otodom': otodom_page_url,
+    'olx': olx_page_url,
+    'nieruchomosci_online': nieruchomosci_page_url,
+}
+MAX_PAGES = 3  # result pages of one search fetched per run at most
+
+MAX_RADIUS_CITIES = 10  # nearest cities searched for a user watching a radius
+
+# Sites whose listings don't show the number of rooms, the portal has to filter the rooms
+ROOMS_FILTERED_BY_PORTAL = {'olx', 'nieruchomosci_online'}
+
+
+def user_filters(user_id):
+    """Extract user-specific filter parameters"""
+    return {
+        'min_price': db.user_data[user_id]['minimum_price'],
+        'max_price': db.user_data[user_id]['maximum_price'],
+        'owner_type': db.user_data[user_id]['owner_type'],
+        'view_type': db.user_data[user_id]['view_type'],
+        'limit': db.user_data[user_id]['limit'],
+        'area_min': db.user_data[user_id]['area_min'],
+        'area_max': db.user_data[user_id]['area_max'],
+        'selected_rooms': db.user_data[user_id]['selected_rooms'],
+        'by': db.user_data[user_id]['by'],
+        'direction': db.user_data[user_id]['direction'],
+        'days': db.user_data[user_id]['days'],
+        'offer_type': db.user_data[user_id]['offer_type'],
+        'region': db.user_data[user_id]['region'],
+        'city': db.user_data[user_id]['city'],
+        'district': db.user_data[user_id]['city'].get('district'),
+        'radius_km': db.user_data[user_id]['radius_km'],
+    }
+
+
+def search_filters(filters, site=None):
+    """
+    Returns the filters used for the portal search of the site.
+    Price, area and rooms are left wide open so that every user watching the same
+    city and offer type shares one search; they are applied locally by matcher.SubscriberFilters.
+    Sites in ROOMS_FILTERED_BY_PORTAL keep the user's rooms, their listings can't be filtered by rooms locally.
+    """
+    if site in ROOMS_FILTERED_BY_PORTAL:
+        selected_rooms = sorted(set(filters['selected_rooms']))
+    else:
+        selected_rooms = list(DEFAULT_USER_DATA['selected_rooms'])
+    return dict(
+        filters,
+        min_price=DEFAULT_USER_DATA['minimum_price'],
+        max_price=DEFAULT_USER_DATA['maximum_price'],
+        area_min=DEFAULT_USER_DATA['area_min'],
+        area_max=DEFAULT_USER_DATA['area_max'],
+        selected_rooms=selected_rooms,
+    )
+
+
+def active_monitors():
+    """Returns ids of all users with monitoring turned on"""
+    return [user_id for user_id, data in db.user_data.items() if data['monitoring']]
+
+
+def user_locations(filters):
+    """
+    Returns [(region, city)] to search for the user: their city, or with a radius set,
+    the nearest cities around their city or district.
+    """
+    if filters['radius_km']:
+        place = locate(filters['region'], filters['city'])
+        if place is not None:
+            return cities_within(place, filters['radius_km'], MAX_RADIUS_CITIES)
+    return [(filters['region'], filters['city'])]
+
+
+def user_searches(user_id):
+    """Returns {(site, url): search filters} of the canonical searches of every site for the user"""
+    filters = user_filters(user_id)
+    searches = {}
+    for region, city in user_locations(filters):
+        # Districts are filtered locally, the search covers the whole city
+        city = {"text" : city['text'], "url" : city['url'], "text_simple" : city['text_simple']}
+        location_filters = dict(filters, region=region, city=city, district=None)
+        for site, (build_url, parse_function) in SITES.items():
+            shared_filters = search_filters(location_filters, site)
+            searches[(site, build_url(shared_filters))] = shared_filters
+    return searches
+
+
+def plan_searches(user_ids):
+    """
+    Groups users by the canonical search url of every site.
+    Returns {(site, url): {'filters': ..., 'users': {user_id, ...}}} so that each
+    distinct url is fetched once and its offers are handed to every subscriber.
+    """
+    searches = {}
+    for user_id in user_ids:
+        for key, shared_filters in user_searches(user_id).items():
+            search = searches.setdefault(key, {'filters': shared_filters, 'users': set()})
+            search['users'].add(user_id)
+    return searches
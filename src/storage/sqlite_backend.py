@@ -0,0 +1,91 @@
+import abc
+import json
+import sqlite3
+import threading
+
+
+class StorageBackend(abc.ABC):
+    """
+    Interface of the durable storage behind db_placeholder.
+    Settings are passed as the dicts returned by UserSettings.changes(),
+    seen offers as the bytes of a pickled SeenOffers.
+    """
+
+    @abc.abstractmethod
+    def load_users(self, only_monitoring=False):
+        """Returns {user_id: settings}, only for users with monitoring on if asked."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def load_user(self, user_id):
+        """Returns the settings of the user, or None for a new user."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def load_seen_offers(self, user_id, site):
+        """Returns the seen offers index of the user named site, like 'otodom:warszawa' for a search or 'clusters', or None."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save(self, users, seen_offers):
+        """Writes {user_id: settings} and {(user_id, site): seen offers} in one batch."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteBackend(StorageBackend):
+    """Keeps everything in one SQLite file in WAL mode, each save() is a single transaction."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            # WAL keeps the database consistent without an fsync on every commit
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS users ('
+                'user_id INTEGER PRIMARY KEY, monitoring INTEGER NOT NULL DEFAULT 0, settings TEXT NOT NULL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS users_monitoring ON users (monitoring)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS seen_offers ('
+                'user_id INTEGER NOT NULL, site TEXT NOT NULL, state BLOB NOT NULL, PRIMARY KEY (user_id, site))'
+            )
+
+    def load_users(self, only_monitoring=False):
+        query = 'SELECT user_id, settings FROM users'
+        if only_monitoring:
+            query += ' WHERE monitoring = 1'
+        with self._lock:
+            rows = self._connection.execute(query).fetchall()
+        return {user_id: json.loads(settings) for user_id, settings in rows}
+
+    def load_user(self, user_id):
+        with self._lock:
+            row = self._connection.execute('SELECT settings FROM users WHERE user_id = ?', (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_seen_offers(self, user_id, site):
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT state FROM seen_offers WHERE user_id = ? AND site = ?', (user_id, site)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, users, seen_offers):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO users (user_id, monitoring, settings) VALUES (?, ?, ?)',
+                [(user_id, int(bool(settings.get('monitoring'))), json.dumps(settings)) for user_id, settings in users.items()],
+            )
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO seen_offers (user_id, site, state) VALUES (?, ?, ?)',
+                [(user_id, site, state) for (user_id, site), state in seen_offers.items()],
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,89 @@
+import functools
+import pickle
+import threading
+from src.utils.seen_offers import SeenOffers
+from src.utils.user_settings import UserSettings
+
+
+class UserStore:
+    """
+    Drop-in for the user_data dict: user_data[user_id] returns the UserSettings of the user,
+    loading it from the backend or creating it on first access. Only users with monitoring on
+    are loaded at startup. Written settings are collected by take_changes() for a batched save.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._users = {}
+        self._dirty = set()
+        self._lock = threading.RLock()
+
+        for user_id, changes in backend.load_users(only_monitoring=True).items():
+            self._users[user_id] = UserSettings.from_changes(changes, functools.partial(self._mark_dirty, user_id))
+
+    def _mark_dirty(self, user_id):
+        with self._lock:
+            self._dirty.add(user_id)
+
+    def __getitem__(self, key):
+        with self._lock:
+            settings = self._users.get(key)
+            if settings is None:
+                changes = self.backend.load_user(key) or {}
+                settings = UserSettings.from_changes(changes, functools.partial(self._mark_dirty, key))
+                self._users[key] = settings
+            return settings
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            value.on_change = functools.partial(self._mark_dirty, key)
+            self._users[key] = value
+            self._dirty.add(key)
+
+    def __contains__(self, key):
+        return key in self._users
+
+    def items(self):
+        """Returns the users loaded so far, which includes every user with monitoring on."""
+        with self._lock:
+            return list(self._users.items())
+
+    def take_changes(self):
+        """Returns {user_id: settings} of the users written since the last call."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return {user_id: self._users[user_id].changes() for user_id in dirty}
+
+
+class SeenOffersStore:
+    """
+    Drop-in for the seen offers dict: seen_offers[(user_id, name)] returns the SeenOffers index,
+    loading it from the backend or creating it on first access. An index is saved with the next
+    batch after an offer was added to it.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._indexes = {}
+        self._dirty = set()
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            seen_offers = self._indexes.get(key)
+            if seen_offers is None:
+                state = self.backend.load_seen_offers(*key)
+                seen_offers = pickle.loads(state) if state else SeenOffers()
+                seen_offers.on_change = functools.partial(self._mark_dirty, key)
+                self._indexes[key] = seen_offers
+            return seen_offers
+
+    def _mark_dirty(self, key):
+        with self._lock:
+            self._dirty.add(key)
+
+    def take_changes(self):
+        """Returns {(user_id, site): pickled index} of the indexes changed since the last call."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return {key: pickle.dumps(self._indexes[key], protocol=pickle.HIGHEST_PROTOCOL) for key in dirty}
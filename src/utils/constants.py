@@ -48,5 +48,11 @@ DEFAULT_USER_DATA = {
     'offer_type': 'rent',
     'region': 'Mazowieckie',
     'city': {"text":"Warszawa","url":"warszawa", "text_simple":"Warszawa"},
-    'displayed_offers': set(),
+    'monitoring': False,
+    'check_interval': 240,  # seconds between two checks of the user's searches
+    'radius_km': 0,  # search the cities around the location within this distance, 0 for the city only
+    'digest_interval': 0,  # seconds between two digests of the new offers, 0 sends every offer right away
+    'digest_order': 'price_per_m2',  # or 'recent'
+    'first_name': None,  # profile of the user cached from their updates, for log messages
+    'username': None,
 }
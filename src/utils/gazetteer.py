@@ -0,0 +1,216 @@
+import bisect
+import heapq
+import json
+import math
+import os
+import pickle
+import threading
+from collections import Counter, defaultdict
+
+CITIES_FILE = os.path.join(os.path.dirname(__file__), 'miasta_.json')
+# Compact prebuilt form of the indexes, rebuilt whenever miasta_.json is newer
+CACHE_FILE = os.path.join(os.path.dirname(__file__), 'miasta_.pickle')
+CACHE_VERSION = 3
+GRID_CELL = 0.1  # degrees, a cell of the spatial grid is about 11 x 7 km in Poland
+EARTH_RADIUS = 6371  # km
+
+_lock = threading.Lock()
+_gazetteer = None
+
+
+def remove_polish_chars(city):
+    city = city.lower().replace('ą', 'a').replace('ć', 'c').replace('ę', 'e').replace('ł', 'l').replace('ń', 'n').replace('ó', 'o').replace('ś', 's').replace('ź', 'z').replace('ż', 'z')
+    return city
+
+
+def trigrams(name):
+    padded = f'  {name} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _build(data):
+    regions = {}
+    # Every city and district by id, and a sorted (normalized name, id) array for prefix search
+    places = {}
+    prefixes = []
+    # (lat cell, lon cell) -> ids of the cities and districts in it
+    grid = defaultdict(list)
+    for region in data:
+        cities = [city for city in region['cities'] if city]
+        exact = {}
+        index = defaultdict(list)
+        for position, city in enumerate(cities):
+            key = remove_polish_chars(city['text_simple'])
+            # Keep the first city of a name, like the old linear scan did
+            exact.setdefault(key, position)
+            for trigram in trigrams(key):
+                index[trigram].append(position)
+
+            place_id = f"c{city['id']}"
+            places[place_id] = {'id': place_id, 'region': region['region_name'], 'city': city, 'district': None}
+            prefixes.append((key, place_id))
+            grid[_cell(city)].append(place_id)
+            for district in city['districts']:
+                place_id = f"d{district['id']}"
+                places[place_id] = {'id': place_id, 'region': region['region_name'], 'city': city, 'district': district}
+                grid[_cell(district)].append(place_id)
+                # Reachable both as 'mokotow' and as 'warszawa mokotow'
+                district_key = remove_polish_chars(district['text_district'])
+                prefixes.append((district_key, place_id))
+                prefixes.append((f'{key} {district_key}', place_id))
+
+        regions[remove_polish_chars(region['region_name'])] = {
+            'name': region['region_name'],
+            'cities': cities,
+            'exact': exact,
+            'trigrams': {trigram: tuple(positions) for trigram, positions in index.items()},
+        }
+    prefixes.sort()
+    return {
+        'version': CACHE_VERSION,
+        'regions': regions,
+        'places': places,
+        'prefix_keys': [key for key, place_id in prefixes],
+        'prefix_ids': [place_id for key, place_id in prefixes],
+        'grid': {cell: tuple(place_ids) for cell, place_ids in grid.items()},
+    }
+
+
+def _cell(place):
+    return math.floor(float(place['lat']) / GRID_CELL), math.floor(float(place['lon']) / GRID_CELL)
+
+
+def _load():
+    try:
+        if os.path.getmtime(CACHE_FILE) >= os.path.getmtime(CITIES_FILE):
+            with open(CACHE_FILE, 'rb') as file:
+                gazetteer = pickle.load(file)
+            if gazetteer.get('version') == CACHE_VERSION:
+                return gazetteer
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    with open(CITIES_FILE, 'r', encoding='utf-8') as file:
+        gazetteer = _build(json.load(file))
+
+    try:
+        with open(CACHE_FILE, 'wb') as file:
+            pickle.dump(gazetteer, file, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass  # read-only checkout, the indexes are rebuilt on the next start
+    return gazetteer
+
+
+def get_gazetteer():
+    """Returns the city indexes, loading them on first use. Call it at startup to preload."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _lock:
+            if _gazetteer is None:
+                _gazetteer = _load()
+    return _gazetteer
+
+
+def get_region(region):
+    """Returns the indexed region by its name, ignoring case and polish characters, or None."""
+    return get_gazetteer()['regions'].get(remove_polish_chars(region))
+
+
+def fuzzy_candidates(region, name, limit=8):
+    """Returns the cities of the region sharing the most trigrams with the normalized name."""
+    counts = Counter()
+    for trigram in trigrams(name):
+        counts.update(region['trigrams'].get(trigram, ()))
+    return [region['cities'][position] for position, count in counts.most_common(limit)]
+
+
+def get_place(place_id):
+    """Returns {'id', 'region', 'city', 'district'} of a city ('c<id>') or district ('d<id>'), or None."""
+    return get_gazetteer()['places'].get(place_id)
+
+
+def suggest(query, limit=10):
+    """
+    Returns up to limit places whose normalized name starts with the query.
+    Exact names come first, then cities before districts, then shorter names.
+    """
+    query = ' '.join(remove_polish_chars(query).split())
+    if not query:
+        return []
+
+    gazetteer = get_gazetteer()
+    keys, ids = gazetteer['prefix_keys'], gazetteer['prefix_ids']
+    # Everything starting with the query sits between these two positions of the sorted array
+    start = bisect.bisect_left(keys, query)
+    end = bisect.bisect_left(keys, query + '\uffff', start)
+
+    ranked = {}
+    for position in range(start, end):
+        place_id = ids[position]
+        rank = (keys[position] != query, place_id[0] == 'd', len(keys[position]))
+        if place_id not in ranked or rank < ranked[place_id]:
+            ranked[place_id] = rank
+    best = heapq.nsmallest(limit, ranked.items(), key=lambda item: item[1])
+    return [gazetteer['places'][place_id] for place_id, rank in best]
+
+
+def locate(region, city):
+    """
+    Returns the place of a stored location: the city dict kept in user data, with its optional district.
+    None when the city is no longer in miasta_.json.
+    """
+    region_ = get_region(region)
+    if region_ is None:
+        return None
+    position = region_['exact'].get(remove_polish_chars(city['text_simple']))
+    if position is None:
+        return None
+    city_ = region_['cities'][position]
+    for district in city_['districts']:
+        if district['text_district'] == city.get('district'):
+            return get_place(f"d{district['id']}")
+    return get_place(f"c{city_['id']}")
+
+
+def distance(lat, lon, other_lat, other_lon):
+    """Great-circle distance in km."""
+    lat, lon, other_lat, other_lon = map(math.radians, (lat, lon, other_lat, other_lon))
+    a = math.sin((other_lat - lat) / 2) ** 2 + math.cos(lat) * math.cos(other_lat) * math.sin((other_lon - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def places_within(lat, lon, radius):
+    """Returns [(distance, place)] of the cities and districts within radius km, nearest first."""
+    gazetteer = get_gazetteer()
+    # Only the grid cells overlapping the bounding box of the circle are checked
+    lat_span = radius / 111.0
+    lon_span = radius / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+    lat_cells = range(math.floor((lat - lat_span) / GRID_CELL), math.floor((lat + lat_span) / GRID_CELL) + 1)
+    lon_cells = range(math.floor((lon - lon_span) / GRID_CELL), math.floor((lon + lon_span) / GRID_CELL) + 1)
+
+    found = []
+    for lat_cell in lat_cells:
+        for lon_cell in lon_cells:
+            for place_id in gazetteer['grid'].get((lat_cell, lon_cell), ()):
+                place = gazetteer['places'][place_id]
+                point = place['district'] or place['city']
+                place_distance = distance(lat, lon, float(point['lat']), float(point['lon']))
+                if place_distance <= radius:
+                    found.append((place_distance, place))
+    found.sort(key=lambda item: item[0])
+    return found
+
+
+def cities_within(place, radius, limit):
+    """
+    Returns [(region, city)] of the at most limit nearest cities having their centre or one of
+    their districts within radius km of the place. One city stands for all its districts,
+    so that is the smallest set of city searches covering the circle.
+    """
+    point = place['district'] or place['city']
+    cities = {}
+    for place_distance, near in places_within(float(point['lat']), float(point['lon']), radius):
+        if len(cities) >= limit:
+            break
+        cities.setdefault(near['city']['id'], (near['region'], near['city']))
+    return list(cities.values())
@@ -0,0 +1,87 @@
+import atexit
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# logger name -> level, from LOG_LEVEL_<logger name with __ for dots>
+LOGGER_LEVELS = {
+    key[len('LOG_LEVEL_'):].lower().replace('__', '.'): level.upper()
+    for key, level in os.environ.items() if key.startswith('LOG_LEVEL_')
+}
+SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 100))  # records of a sampled message let through, one in every N
+
+_listener = None
+
+
+class SampleFilter(logging.Filter):
+    """
+    Lets through one of every `every` records of each message, for events logged per user or per page.
+    Warnings and errors always pass. The count is kept per message template, so rare events aren't drowned.
+    """
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self._counters = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every <= 1:
+            return True
+        counter = self._counters.get(record.msg)
+        if counter is None:
+            counter = self._counters[record.msg] = itertools.count()
+        return next(counter) % self.every == 0
+
+
+def get_sampled_logger(name):
+    """Returns the logger of the subsystem with a SampleFilter, for its high-volume events."""
+    logger = logging.getLogger(name)
+    if not any(isinstance(existing, SampleFilter) for existing in logger.filters):
+        logger.addFilter(SampleFilter(SAMPLE_EVERY))
+    return logger
+
+
+def setup():
+    """
+    Sends every record through a queue to a background listener thread, so the scrape and
+    dispatch threads only pay for putting the record in the queue, never for the I/O.
+    The level is LOG_LEVEL, a subsystem can be tuned with LOG_LEVEL_<logger name with __ for dots>,
+    like LOG_LEVEL_SRC__SCRAPPERS=DEBUG.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    records = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter(FORMAT))
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(records))
+    root.setLevel(LEVEL)
+    for name, level in LOGGER_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+
+def stop():
+    """Writes out the queued records and stops the listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # The stock handler formats the message before queueing it, on the logging thread.
+    # The records stay in this process, so the listener can format them instead.
+    def prepare(self, record):
+        return record
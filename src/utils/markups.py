@@ -26,7 +26,7 @@ regions_keyboard = [
 yes_no_markup = ReplyKeyboardMarkup([['Yes', 'No']], one_time_keyboard=True, resize_keyboard=True)
 
 def get_markup(user_data, user_id):
-    if user_data[user_id]['last_seen_offer_otodom']:
+    if user_data[user_id]['monitoring']:
         return stop_monitoring_markup
     else:
         return start_menu_markup
@@ -0,0 +1,59 @@
+import os
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, start_http_server
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+
+class _NoMetric:
+    """Stands in for every metric when prometheus_client isn't installed, all calls do nothing."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+    def set(self, value):
+        pass
+
+    def set_function(self, function):
+        pass
+
+
+def _metric(kind, name, documentation, labels=(), **kwargs):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoMetric()
+    return kind(name, documentation, labels, **kwargs)
+
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))  # 0 turns the endpoint off
+PAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+
+FETCH_SECONDS = _metric(Histogram, 'rentals_fetch_seconds', 'Time to fetch one search page', ['host'], buckets=PAGE_BUCKETS)
+PARSE_SECONDS = _metric(Histogram, 'rentals_parse_seconds', 'Time to parse one search page', ['source'], buckets=PAGE_BUCKETS)
+CYCLE_SECONDS = _metric(
+    Histogram, 'rentals_cycle_seconds',
+    'Time one scheduler run spends on a source: its slowest fetch plus parsing and matching its pages, source="all" for the whole run',
+    ['source'], buckets=PAGE_BUCKETS + (40, 80),
+)
+LISTINGS = _metric(Counter, 'rentals_listings', 'Listings parsed from search pages', ['source'])
+NEW_OFFERS = _metric(Counter, 'rentals_new_offers', 'Offers new to a user that passed their filters', ['source'])
+MESSAGES_SENT = _metric(Counter, 'rentals_messages_sent', 'Messages delivered to Telegram', ['priority'])
+RATE_LIMITED = _metric(Counter, 'rentals_rate_limited', 'Telegram 429 responses')
+ERRORS = _metric(Counter, 'rentals_errors', 'Failed fetches, parses, notifications and sends, and blocked fetches', ['kind'])
+ACTIVE_MONITORS = _metric(Gauge, 'rentals_active_monitors', 'Users with monitoring on')
+SEARCH_BACKLOG = _metric(Gauge, 'rentals_search_backlog', 'Searches that are due but wait for the scrape budget')
+OUTBOX_BACKLOG = _metric(Gauge, 'rentals_outbox_backlog', 'Messages waiting in the outbox')
+CIRCUIT_OPEN = _metric(Gauge, 'rentals_circuit_open', '1 while the scrapes of a portal host are skipped after failures or blocks', ['host'])
+
+
+def start():
+    """Serves the metrics at http://127.0.0.1:METRICS_PORT/metrics, when prometheus_client is installed."""
+    if PROMETHEUS_AVAILABLE and METRICS_PORT:
+        start_http_server(METRICS_PORT, addr='127.0.0.1')
@@ -0,0 +1,198 @@
+import heapq
+import logging
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from telegram import Bot
+from telegram.error import RetryAfter
+from src.utils.metrics import ERRORS, MESSAGES_SENT, RATE_LIMITED
+
+INTERACTIVE = 0  # replies to the user's own actions go first
+NOTIFICATION = 1
+CHAT_INTERVAL = 1  # seconds between two messages to one chat
+MAX_MESSAGE_LENGTH = 4096
+SEPARATOR = '\n\n'
+MESSAGES_PER_SECOND = float(os.getenv('MESSAGES_PER_SECOND', 25))  # global budget, Telegram allows about 30
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Queue of outgoing messages delivered by one background thread within Telegram's flood limits:
+    a global token bucket and at most one message per CHAT_INTERVAL to each chat.
+    Interactive replies overtake queued notifications, notifications waiting for the same chat
+    are combined into one message, and a 429 pauses delivery for its retry_after.
+    """
+
+    def __init__(self, send):
+        """send(chat_id, text, **kwargs) delivers one message"""
+        self._send = send
+        # chat_id -> (interactive messages, notifications), each message is (text, kwargs)
+        self._pending = {}
+        # (priority, sequence, chat_id) of chats that may be sent to now
+        self._ready = []
+        # (ready at, sequence, chat_id) of chats that sent a message less than CHAT_INTERVAL ago
+        self._waiting = []
+        # chat_id -> sequence of its valid heap entry, other entries of the chat are stale
+        self._scheduled = {}
+        # chat_id -> time the chat may get its next message
+        self._next_send = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._tokens = 1
+        self._last_refill = time.monotonic()
+        self._paused_until = 0
+        self._stopping = False
+        self._thread = None
+
+    def put(self, chat_id, text, priority=INTERACTIVE, **kwargs):
+        """Queues the message and returns at once."""
+        with self._condition:
+            queues = self._pending.get(chat_id)
+            if queues is None:
+                queues = self._pending[chat_id] = (deque(), deque())
+            queues[priority].append((text, kwargs))
+            # A new chat needs an entry, an interactive message needs one with its priority
+            if chat_id not in self._scheduled or priority == INTERACTIVE:
+                self._schedule(chat_id, time.monotonic())
+            self._condition.notify()
+
+    def __len__(self):
+        with self._condition:
+            return sum(len(interactive) + len(notifications) for interactive, notifications in self._pending.values())
+
+    def _schedule(self, chat_id, now):
+        sequence = next(self._sequence)
+        self._scheduled[chat_id] = sequence
+        ready_at = self._next_send.get(chat_id, 0)
+        if ready_at <= now:
+            heapq.heappush(self._ready, (self._priority(chat_id), sequence, chat_id))
+        else:
+            heapq.heappush(self._waiting, (ready_at, sequence, chat_id))
+
+    def _priority(self, chat_id):
+        return INTERACTIVE if self._pending[chat_id][INTERACTIVE] else NOTIFICATION
+
+    def _take(self, chat_id):
+        """Pops the next (text, kwargs, priority) of the chat, joining the notifications that fit into one message."""
+        interactive, notifications = self._pending[chat_id]
+        if interactive:
+            return interactive.popleft() + (INTERACTIVE,)
+        text, kwargs = notifications.popleft()
+        if not any(kwargs.values()):
+            while notifications and not any(notifications[0][1].values()):
+                if len(text) + len(SEPARATOR) + len(notifications[0][0]) > MAX_MESSAGE_LENGTH:
+                    break
+                text += SEPARATOR + notifications.popleft()[0]
+        return text, kwargs, NOTIFICATION
+
+    def _next_message(self):
+        """Waits until a message may be sent and returns (chat_id, text, kwargs, priority), or None when stopped."""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._waiting and self._waiting[0][0] <= now:
+                    ready_at, sequence, chat_id = heapq.heappop(self._waiting)
+                    if self._scheduled.get(chat_id) == sequence:
+                        heapq.heappush(self._ready, (self._priority(chat_id), sequence, chat_id))
+
+                if self._stopping and not self._pending:
+                    return None
+
+                rate = MESSAGES_PER_SECOND
+                self._tokens = min(self._tokens + (now - self._last_refill) * rate, max(rate, 1))
+                self._last_refill = now
+
+                if self._ready and self._tokens >= 1 and now >= self._paused_until:
+                    priority, sequence, chat_id = heapq.heappop(self._ready)
+                    if self._scheduled.get(chat_id) != sequence:
+                        continue  # stale entry
+                    self._tokens -= 1
+                    message = self._take(chat_id)
+                    self._next_send[chat_id] = now + CHAT_INTERVAL
+                    if any(self._pending[chat_id]):
+                        self._schedule(chat_id, now)
+                    else:
+                        del self._pending[chat_id]
+                        del self._scheduled[chat_id]
+                    return (chat_id,) + message
+
+                timeouts = [self._waiting[0][0] - now] if self._waiting else []
+                if self._ready:
+                    timeouts.append(max(self._paused_until - now, (1 - self._tokens) / rate))
+                self._condition.wait(min(timeouts) if timeouts else None)
+
+    def _retry(self, chat_id, text, kwargs, priority, retry_after):
+        """Puts the message back in front of its chat and pauses all delivery, a 429 is about the whole bot."""
+        with self._condition:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + retry_after)
+            queues = self._pending.get(chat_id)
+            if queues is None:
+                queues = self._pending[chat_id] = (deque(), deque())
+            queues[priority].appendleft((text, kwargs))
+            self._schedule(chat_id, now)
+
+    def _prune(self, now):
+        # Chats idle for a while don't need their last send time anymore
+        for chat_id in [chat_id for chat_id, ready_at in self._next_send.items() if ready_at < now]:
+            del self._next_send[chat_id]
+
+    def _deliver(self):
+        last_prune = time.monotonic()
+        while True:
+            message = self._next_message()
+            if message is None:
+                return
+            chat_id, text, kwargs, priority = message
+            try:
+                self._send(chat_id, text, **kwargs)
+                MESSAGES_SENT.labels('interactive' if priority == INTERACTIVE else 'notification').inc()
+            except RetryAfter as e:
+                RATE_LIMITED.inc()
+                logger.warning('rate limited chat=%s retry_after=%s', chat_id, e.retry_after)
+                self._retry(chat_id, text, kwargs, priority, e.retry_after)
+            except Exception as e:
+                ERRORS.labels('send').inc()
+                logger.warning('send failed chat=%s error=%r', chat_id, e)
+
+            if time.monotonic() - last_prune > 60:
+                last_prune = time.monotonic()
+                with self._condition:
+                    self._prune(last_prune)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._deliver, name='outbox', daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=10):
+        """Delivers what is queued, waiting at most timeout seconds."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class QueuedBot(Bot):
+    """
+    Bot whose send_message only queues the message in its outbox, so neither the handlers nor
+    the scrape job wait on Telegram. The message is sent later and send_message returns None.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.outbox = Outbox(self.send_message_now)
+
+    def send_message_now(self, chat_id, text, **kwargs):
+        return super().send_message(chat_id, text, **kwargs)
+
+    def send_message(self, chat_id, text, *args, priority=INTERACTIVE, **kwargs):
+        if args:
+            # Positional options, as in Bot.send_message's signature after the text
+            names = ('parse_mode', 'disable_web_page_preview', 'disable_notification', 'reply_to_message_id', 'reply_markup')
+            kwargs.update(zip(names, args))
+        self.outbox.put(chat_id, text, priority, **kwargs)
@@ -0,0 +1,85 @@
+import hashlib
+import re
+import time
+from array import array
+
+MAX_SEEN = 200  # offers remembered per user and search, MAX_PAGES result pages hold at most 108
+MAX_AGE = 14 * 24 * 60 * 60  # seconds after which a seen offer may be notified again
+
+# otodom '...-ID4qXyz', olx '...-ID10aBc.html', nieruchomosci-online '.../25123456.html'
+OFFER_ID_PATTERNS = [
+    re.compile(r'-ID([0-9A-Za-z]+)(?:\.html)?(?:[?#]|$)'),
+    re.compile(r'/(\d+)\.html(?:[?#]|$)'),
+]
+
+
+def offer_id(link):
+    """Returns the portal's id of the offer, or the link without query and fragment when it has none."""
+    for pattern in OFFER_ID_PATTERNS:
+        match = pattern.search(link)
+        if match:
+            return match.group(1)
+    return link.split('#')[0].split('?')[0]
+
+
+def offer_hash(link):
+    """64-bit hash of the normalized offer id."""
+    return int.from_bytes(hashlib.blake2b(offer_id(link).encode(), digest_size=8).digest(), 'little')
+
+
+class SeenOffers:
+    """
+    Fixed size index of the offers already shown to a user for one source.
+    A ring buffer of 64-bit hashes keeps the memory constant: the oldest offer is
+    forgotten when a new one comes in, and an offer older than MAX_AGE counts as unseen.
+    """
+    __slots__ = ('hashes', 'times', 'position', 'index', 'on_change')
+
+    def __init__(self, size=MAX_SEEN, on_change=None):
+        self.hashes = array('Q', [0]) * size
+        self.times = array('I', [0]) * size
+        self.position = 0
+        self.index = {}  # hash -> seen at
+        # Called after every added offer, the seen offers store uses it to schedule a save
+        self.on_change = on_change
+
+    def __contains__(self, link):
+        seen_at = self.index.get(offer_hash(link))
+        return seen_at is not None and time.time() - seen_at <= MAX_AGE
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, link, now=None):
+        now = int(now or time.time())
+        offer = offer_hash(link)
+        seen_at = self.index.get(offer)
+        if seen_at is not None and now - seen_at <= MAX_AGE:
+            return
+
+        # Overwrite the oldest slot of the ring, unless its offer was added again in a newer slot
+        old_offer = self.hashes[self.position]
+        if self.times[self.position] and self.index.get(old_offer) == self.times[self.position]:
+            del self.index[old_offer]
+        self.hashes[self.position] = offer
+        self.times[self.position] = now
+        self.index[offer] = now
+        self.position = (self.position + 1) % len(self.hashes)
+        if self.on_change is not None:
+            self.on_change()
+
+    def __getstate__(self):
+        return self.hashes.tobytes(), self.times.tobytes(), self.position
+
+    def __setstate__(self, state):
+        hashes, times, self.position = state
+        self.hashes = array('Q')
+        self.hashes.frombytes(hashes)
+        self.times = array('I')
+        self.times.frombytes(times)
+        self.index = {}
+        self.on_change = None
+        # Walk from the oldest slot so a newer slot of the same offer wins
+        for slot in list(range(self.position, len(self.hashes))) + list(range(self.position)):
+            if self.times[slot]:
+                self.index[self.hashes[slot]] = self.times[slot]
@@ -0,0 +1,62 @@
+import copy
+from src.utils.constants import DEFAULT_USER_DATA
+
+
+class UserSettings:
+    """
+    Settings of one user, read and written like the dict they replace: settings['offer_type'].
+    Only values the user changed take up a slot, everything else is read from DEFAULT_USER_DATA.
+    Mutable defaults (rooms list, city dict) are copied on first access, so users never share them.
+    """
+    __slots__ = tuple(DEFAULT_USER_DATA) + ('on_change',)
+
+    def __init__(self, on_change=None):
+        # Called after every write, the user store uses it to schedule a save
+        self.on_change = on_change
+
+    @classmethod
+    def from_changes(cls, changes, on_change=None):
+        """Builds the record from the values returned by changes(), ignoring settings that no longer exist."""
+        settings = cls(on_change)
+        for key, value in changes.items():
+            if key in DEFAULT_USER_DATA:
+                setattr(settings, key, value)
+        return settings
+
+    def changes(self):
+        """Returns the values that are stored for this user instead of read from the defaults."""
+        return {key: getattr(self, key) for key in DEFAULT_USER_DATA if hasattr(self, key)}
+
+    def __getitem__(self, key):
+        if key not in DEFAULT_USER_DATA:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            pass
+
+        value = DEFAULT_USER_DATA[key]
+        if isinstance(value, (list, dict, set)):
+            # The caller may change it in place, give this user its own copy
+            value = copy.deepcopy(value)
+            setattr(self, key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in DEFAULT_USER_DATA:
+            raise KeyError(key)
+        setattr(self, key, value)
+        if self.on_change is not None:
+            self.on_change()
+
+    def __contains__(self, key):
+        return key in DEFAULT_USER_DATA
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f'UserSettings({self.changes()})'
@@ -0,0 +1,62 @@
+import json
+from src.scrappers.duplicates import assign_clusters
+from src.scrappers.listing import Listing
+from src.scrappers.olx_scrapper import parse_olx
+from src.scrappers.otodom_scrapper import parse_otodom
+
+
+def otodom_page(items):
+    data = {'props': {'pageProps': {'data': {'searchAds': {'items': items}}}}}
+    return f'<html><script id="__NEXT_DATA__" type="application/json">{json.dumps(data)}</script></html>'.encode()
+
+
+def otodom_item(offer_id, slug=True):
+    item = {
+        'id': offer_id,
+        'title': 'Mieszkanie',
+        'totalPrice': {'value': 3000, 'currency': 'PLN'},
+        'areaInSquareMeters': 40 + offer_id,
+        'roomsNumber': 'TWO',
+    }
+    if slug:
+        item['slug'] = f'mieszkanie-ID{offer_id}'
+    return item
+
+
+def test_listings_without_a_link_are_dropped():
+    listings = parse_otodom(otodom_page([otodom_item(1), otodom_item(2, slug=False), otodom_item(3, slug=False)]))
+    assert [listing.offer_id for listing in listings] == ['1']
+    assign_clusters(listings)
+    assert listings[0].cluster_id == 'otodom:1'
+
+
+def test_olx_cards_without_a_link_are_dropped():
+    card = '<div class="css-1g5933j" data-cy="l-card"><h6 class="css-1wxaaza">Mieszkanie</h6>{}</div>'
+    link = '<a class="css-z3gu2d" href="/d/oferta/mieszkanie-ID1a.html"></a>'
+    content = f'<html><body>{card.format(link)}{card.format("")}</body></html>'.encode()
+    for backend in ('lxml', 'bs4'):
+        assert [listing.offer_id for listing in parse_olx(content, backend)] == ['1a']
+
+
+def test_rooms_are_read_from_titles():
+    titles = {
+        '2-pokojowe mieszkanie z balkonem': 2,
+        'Mieszkanie 3 pokojowe, Mokotów': 3,
+        'Przestronne 4 pokoje blisko metra': 4,
+        'Wynajmę 2 pok. z ogródkiem': 2,
+        'Dwupokojowe mieszkanie na Woli': 2,
+        'Trzy pokojowe po remoncie': 3,
+        'Kawalerka przy metrze': 1,
+        'Wynajmę kawalerkę': 1,
+        'Mieszkanie 45 m2, balkon': None,
+        'Apartament w centrum': None,
+    }
+    for title, rooms in titles.items():
+        assert Listing.from_raw('olx', {'title': title, 'link': 'https://www.olx.pl/d/oferta/a-ID1.html'}).rooms == rooms, title
+
+
+def test_unparsed_values_keep_the_portal_text():
+    listing = Listing.from_raw('otodom', {'title': 'Mieszkanie', 'link': 'https://www.otodom.pl/pl/oferta/a-ID1', 'price': 'Zapytaj o cenę', 'floor': 'poddasze'})
+    assert listing.price is None and listing.price_text == 'Zapytaj o cenę'
+    assert listing.floor is None and listing.floor_text == 'poddasze'
+    assert Listing.from_raw('otodom', {'title': 'Mieszkanie', 'link': 'https://www.otodom.pl/pl/oferta/a-ID1', 'floor': 'parter'}).floor_text == 'parter'
@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+import pytest
+import db_placeholder as db
+from benchmarks.fixture_server import freshen, load
+from src.commands import digest, monitoring
+from src.scrappers.scrape_planner import user_searches
+from src.storage.sqlite_backend import SqliteBackend
+from src.utils.gazetteer import get_gazetteer
+
+# Every search of a site gets the recorded page of the site, with offer ids of its own for every city and page number
+FIXTURES = {'www.otodom.pl': 'otodom', 'www.olx.pl': 'olx', 'www.nieruchomosci-online.pl': 'nieruchomosci_online'}
+
+
+class Bot:
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+@pytest.fixture
+def user(tmp_path, monkeypatch):
+    epochs = {}
+
+    def fetch_all(urls, conditional=True):
+        pages = {}
+        for url in urls:
+            host = next(host for host in FIXTURES if host in url)
+            pages[url] = freshen(load(FIXTURES[host]), epochs.setdefault(url, len(epochs) + 1), 0)
+        return pages
+
+    monkeypatch.setattr(monitoring, 'fetch_all', fetch_all)
+    db.init(SqliteBackend(str(tmp_path / 'test.db')))
+    place = next(place for place in get_gazetteer()['places'].values() if place['city']['text_simple'] == 'Warszawa' and place['district'] is None)
+    settings = db.user_data[1]
+    settings['region'] = place['region']
+    settings['city'] = {key: place['city'][key] for key in ('text', 'url', 'text_simple')}
+    settings['monitoring'] = True
+    yield settings
+    db.close()
+
+
+def run_cycle(user_id):
+    bot = Bot()
+    searches = {key: {'filters': filters, 'users': {user_id}, 'conditional': False} for key, filters in user_searches(user_id).items()}
+    monitoring.run_searches(SimpleNamespace(bot=bot), searches)
+    return bot.messages
+
+
+@pytest.mark.parametrize('radius_km', [0, 20])
+def test_unchanged_pages_bring_no_new_offers(user, radius_km):
+    user['radius_km'] = radius_km
+    if radius_km:
+        assert len({filters['city']['url'] for filters in user_searches(1).values()}) > 1
+
+    # The first check sends at most FIRST_RUN_OFFERS per site, whatever the number of cities
+    assert 0 < len(run_cycle(1)) <= monitoring.FIRST_RUN_OFFERS * 3
+    assert run_cycle(1) == []
+    assert run_cycle(1) == []
+
+
+def test_max_pages_limits_the_pages_fetched(user, monkeypatch):
+    run_cycle(1)
+    fetched = []
+    fetch_all = monitoring.fetch_all
+
+    def counting_fetch_all(urls, conditional=True):
+        urls = list(urls)
+        fetched.extend(urls)
+        return {url: freshen(page, 99, 0) for url, page in fetch_all(urls, conditional).items()}
+
+    # Every page of the next cycle is new, so the search would go on to the next pages
+    monkeypatch.setattr(monitoring, 'fetch_all', counting_fetch_all)
+    monkeypatch.setattr(monitoring, 'MAX_PAGES', 1)
+    searches = user_searches(1)
+    run_cycle(1)
+    assert len(fetched) == len(searches)
+
+
+def test_a_search_matching_nothing_is_checked_once(user, monkeypatch):
+    user['maximum_price'] = 1
+    assert run_cycle(1) == []
+    fetched = []
+    fetch_all = monitoring.fetch_all
+
+    def counting_fetch_all(urls, conditional=True):
+        urls = list(urls)
+        fetched.extend(urls)
+        return {url: freshen(page, 99, 0) for url, page in fetch_all(urls, conditional).items()}
+
+    # The first check is over, so a page of new offers leads on to the next page
+    monkeypatch.setattr(monitoring, 'fetch_all', counting_fetch_all)
+    searches = user_searches(1)
+    run_cycle(1)
+    assert len(fetched) > len(searches)
+
+
+def test_digest_offers_count_as_sent_once_the_digest_goes_out(user, monkeypatch):
+    monkeypatch.setattr(digest, '_buffers', {})
+    user['digest_interval'] = digest.DIGEST_INTERVALS['30']
+    assert run_cycle(1) == []
+    buffered = [offer.cluster_id for offer, duplicates, found_at in digest._buffers[1]['offers']]
+    assert buffered and not any(cluster_id in db.seen_offers[(1, 'clusters')] for cluster_id in buffered)
+
+    digest._buffers[1]['since'] -= user['digest_interval']
+    bot = Bot()
+    digest.send_digests(SimpleNamespace(bot=bot))
+    assert len(bot.messages) == 1
+    assert all(cluster_id in db.seen_offers[(1, 'clusters')] for cluster_id in buffered)
@@ -0,0 +1,48 @@
+import pytest
+import db_placeholder as db
+from src.scrappers import scheduler
+from src.storage.sqlite_backend import SqliteBackend
+
+
+@pytest.fixture
+def users(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, '_searches', {})
+    monkeypatch.setattr(scheduler, '_user_searches', {})
+    monkeypatch.setattr(scheduler, '_queue', [])
+    monkeypatch.setattr(scheduler, '_budget', 0)
+    monkeypatch.setattr(scheduler, '_last_tick', None)
+    monkeypatch.setattr(scheduler, '_demand', 0)
+    monkeypatch.setattr(scheduler, 'SCRAPES_PER_SECOND', 100)
+    db.init(SqliteBackend(str(tmp_path / 'test.db')))
+    # Both users search Warszawa, otodom filters rooms locally while the olx searches differ
+    db.user_data[1]['selected_rooms'] = [1]
+    db.user_data[2]['selected_rooms'] = [2]
+    yield
+    db.close()
+
+
+def test_users_sharing_a_url_fetch_it_once(users):
+    scheduler.subscribe(1, run_now=True)
+    scheduler.subscribe(2, run_now=True)
+    searches = scheduler.due_searches()
+
+    otodom = [search for (site, url), search in searches.items() if site == 'otodom']
+    assert len(otodom) == 1
+    assert otodom[0]['users'] == {1, 2}
+    olx = [search['users'] for (site, url), search in searches.items() if site == 'olx']
+    assert sorted(olx) == [{1}, {2}]
+
+
+def test_a_shared_url_is_scheduled_once_and_sets_the_budget(users, monkeypatch):
+    monkeypatch.setattr(scheduler, 'SCRAPES_PER_SECOND', 0)
+    monkeypatch.setattr(scheduler, 'MIN_SCRAPES_PER_SECOND', 0)
+    scheduler.subscribe(1)
+    scheduler.subscribe(2)
+    # One otodom search for both users, an olx and a nieruchomosci-online search for each
+    assert scheduler.size() == (5, 2)
+    interval = db.user_data[1]['check_interval']
+    assert scheduler.scrape_rate() == pytest.approx(5 / interval * (1 + scheduler.JITTER))
+
+    scheduler.unsubscribe(1)
+    assert scheduler.size() == (3, 1)
+    assert scheduler.scrape_rate() == pytest.approx(3 / interval * (1 + scheduler.JITTER))
@@ -0,0 +1,20 @@
+from src.utils.constants import DEFAULT_USER_DATA
+from src.scrappers.scrape_planner import SITES, search_filters
+
+
+def user(selected_rooms):
+    return dict(DEFAULT_USER_DATA, min_price=1000, max_price=3000, selected_rooms=selected_rooms)
+
+
+def test_rooms_stay_in_the_search_of_sites_without_rooms_in_listings():
+    for site in ('olx', 'nieruchomosci_online'):
+        build_url = SITES[site][0]
+        assert search_filters(user([1]), site)['selected_rooms'] == [1]
+        assert build_url(search_filters(user([1]), site)) != build_url(search_filters(user([4]), site))
+        # The order the rooms were picked in doesn't split the search
+        assert build_url(search_filters(user([2, 1]), site)) == build_url(search_filters(user([1, 2]), site))
+
+
+def test_otodom_search_is_shared_by_all_rooms_and_prices():
+    build_url = SITES['otodom'][0]
+    assert build_url(search_filters(user([1]), 'otodom')) == build_url(search_filters(dict(user([3, 4]), min_price=0), 'otodom'))
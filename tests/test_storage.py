@@ -0,0 +1,34 @@
+import pytest
+
+from src.storage.sqlite_backend import SqliteBackend, StorageBackend
+from src.storage.user_store import SeenOffersStore
+
+LINK = 'https://www.otodom.pl/pl/oferta/mieszkanie-ID4qXyz'
+
+
+def test_seen_offers_are_saved_only_after_a_change(tmp_path):
+    backend = SqliteBackend(str(tmp_path / 'test.db'))
+    store = SeenOffersStore(backend)
+
+    assert LINK not in store[(1, 'otodom')]
+    assert store.take_changes() == {}
+
+    store[(1, 'otodom')].add(LINK)
+    changes = store.take_changes()
+    assert list(changes) == [(1, 'otodom')]
+    assert store.take_changes() == {}
+
+    backend.save({}, changes)
+    reloaded = SeenOffersStore(backend)
+    assert LINK in reloaded[(1, 'otodom')]
+    assert reloaded.take_changes() == {}
+    backend.close()
+
+
+def test_a_backend_must_implement_the_whole_interface():
+    class LoadOnly(StorageBackend):
+        def load_users(self, only_monitoring=False):
+            return {}
+
+    with pytest.raises(TypeError):
+        LoadOnly()